@@ -1,6 +1,5 @@
 # Commonly used
 import numpy as np
-import re
 import pandas as pd
 import os
 
@@ -11,39 +10,14 @@ import bs4
 # One package used to detect emoji in text
 import emoji
 
+# The emojis are decoded by the functions in tweet_cleaning.py
+from tweet_cleaning import show_emoji_in_tweet, EmojiDecoder
+
 
 # Load the path where we cound find the 'emoji_dictionary.csv'
 emoji_dictionary_path = r'XXXXX'
 
 
-# This function is used to erase all the 'U+00' pattern in the twitter text
-def remove_u_plus(text):
-    result = re.sub(pattern=r'U\+00', repl=r'', string=text)
-    return result
-
-
-def show_emoji_in_tweet(text, emoji_dictionary):
-    without_u = remove_u_plus(text)
-    old_text = without_u
-    old_text = old_text.encode('unicode_escape').decode('utf-8')
-    result1 = re.sub(pattern='\\\\r', repl='', string=old_text)
-    result2 = re.sub(pattern='\\\\n', repl='', string=result1)
-    result3 = re.sub(pattern='\\\\x([a-z0-9]{2})', repl = '<\\1>', string=result2)
-    old_text = result3
-    for _, row in emoji_dictionary.iterrows():
-        if row['R_Encoding'] in old_text:
-            new_text = re.sub(pattern=row['R_Encoding'], repl=row['emoji'], string=old_text)
-            old_text = new_text
-        else:
-            pass
-        if row['R_Encoding_lower'] in old_text:
-            new_text = re.sub(pattern=row['R_Encoding_lower'], repl=row['emoji'], string=old_text)
-            old_text = new_text
-        else:
-            pass
-    return old_text
-
-
 def char_is_emoji(character):
     return character in emoji.UNICODE_EMOJI
 
@@ -84,5 +58,5 @@ if __name__ == '__main__':
     # A simple case
     # Show the effectiveness of our show_emoji function
     text = '<ed><A0><BD><ed><B8><80>I love this moment!<ed><A0><BD><ed><B8><86><ed><A0><BD><ed><B8><84><ed><A0><BD><ed><B8><84><ed><A0><BD><ed><B8><84>'
-    show_emoji_in_tweet(text, emoji_merged_file)
+    show_emoji_in_tweet(text, EmojiDecoder(emoji_merged_file))
 
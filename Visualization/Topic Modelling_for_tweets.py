@@ -9,8 +9,7 @@ import read_data
 
 from wordcloud import STOPWORDS
 import gensim
-import spacy
-from spacy.tokenizer import Tokenizer
+from functools import lru_cache
 from nltk.tokenize import word_tokenize
 
 # sklearn
@@ -27,15 +26,16 @@ import matplotlib.pyplot as plt
 from PIL import Image
 
 
-# Load the tokenizer in SpaCy
-nlp = spacy.load('en_core_web_sm', disable=['parser', 'ner'])
-tokenizer = Tokenizer(nlp.vocab)
+# Load the SpaCy model the first time it is used rather than when this module is imported
+@lru_cache(maxsize=None)
+def load_spacy_model():
+    import spacy
+    return spacy.load('en_core_web_sm', disable=['parser', 'ner'])
+
 
 # Specify the random seed
 random_seed = 777
 
-whole_tweets = pd.read_pickle(os.path.join(read_data.tweet_2017, 'final_2017_with_sentiment_smote.pkl'))
-
 # gensim.corpora.MmCorpus.serialize('MmCorpusTest.mm', corpus)
 # gensim.corpora.MmCorpus.serialize('MmCorpusTest.mm', corpus)
 stopwords = list(set(STOPWORDS))
@@ -52,6 +52,7 @@ def process_words(texts, stop_words, bigram_mod, trigram_mod, allowed_postags=['
     texts = [bigram_mod[doc] for doc in texts]
     texts = [trigram_mod[bigram_mod[doc]] for doc in texts]
     texts_out = []
+    nlp = load_spacy_model()
     for sent in texts:
         doc = nlp(" ".join(sent))
         texts_out.append([token.lemma_ for token in doc if token.pos_ in allowed_postags])
@@ -6,25 +6,25 @@ import pandas as pd
 import numpy as np
 import os, re
 import string
+from functools import lru_cache
 
 import read_data
+import tweet_token_store
 import Topic_Modelling_for_tweets
 
-import gensim
-from gensim import corpora, models
-import spacy
-
-from wordcloud import WordCloud, STOPWORDS, ImageColorGenerator
-from nltk.tokenize import word_tokenize
-
-import matplotlib.pyplot as plt
-from PIL import Image
+# spaCy, gensim, nltk, wordcloud, matplotlib and PIL are imported in the functions which need them. The spaCy model
+# and the circle mask are loaded the first time they are used
 
 plot_path = read_data.plot_path_2017
 
 unuseful_terms_set = Topic_Modelling_for_tweets.unuseful_terms_set
 
-nlp = spacy.load('en_core_web_sm', disable=['parser', 'ner'])
+
+@lru_cache(maxsize=None)
+def load_spacy_model():
+    import spacy
+    return spacy.load('en_core_web_sm', disable=['parser', 'ner'])
+
 
 # the regex used to detect words is a combination of normal words, ascii art, and emojis
 # 2+ consecutive letters (also include apostrophes), e.x It's
@@ -37,7 +37,18 @@ regexp = r"{normal_word}|{ascii_art}|{emoji}".format(normal_word=normal_word, as
                                                      emoji=emoji)
 symbola_font_path = os.path.join(read_data.plot_path_2017, 'Symbola_Hinted.ttf')
 
-circle_mask = np.array(Image.open(r"F:\CityU\Datasets\Hong Kong Tweets 2017\circle.png"))
+
+@lru_cache(maxsize=None)
+def load_circle_mask():
+    from PIL import Image
+    return np.array(Image.open(r"F:\CityU\Datasets\Hong Kong Tweets 2017\circle.png"))
+
+
+def __getattr__(name):
+    # Keep circle_mask available as a module attribute without reading the image at import time
+    if name == 'circle_mask':
+        return load_circle_mask()
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
 
 
 # Change the color of the wordcloud
@@ -59,6 +70,8 @@ def generate_wordcloud(words, mask, file_name, color_func, saving_path=plot_path
     :param color_func: the function which defines the color of words
     :return: the wordcloud of the input text
     """
+    from wordcloud import WordCloud
+    import matplotlib.pyplot as plt
     # stopwords argument in word_cloud: specify the words we neglect when outputing the wordcloud
     word_cloud = WordCloud(width = 512, height = 512, background_color='white', stopwords=unuseful_terms_set,
                            mask=mask, max_words=800).generate(words)
@@ -76,6 +89,7 @@ def process_words(texts, stop_words, bigram_mod, trigram_mod, allowed_postags=['
     texts = [bigram_mod[doc] for doc in texts]
     texts = [trigram_mod[bigram_mod[doc]] for doc in texts]
     texts_out = []
+    nlp = load_spacy_model()
     for sent in texts:
         doc = nlp(" ".join(sent))
         texts_out.append([token.lemma_ for token in doc if token.pos_ in allowed_postags])
@@ -84,13 +98,15 @@ def process_words(texts, stop_words, bigram_mod, trigram_mod, allowed_postags=['
     return texts_out
 
 
-def create_text_for_wordcloud(df):
+def create_text_for_wordcloud(df, token_store=None):
     """
     :param df: the pandas dataframe which contains the text of tweets
+    :param token_store: the word token store(tweet_token_store.load_token_store('word')). The tweets in it are not
+    tokenized again
     :return: the process text for word cloud generation
     """
-    tweet_text = list(df['cleaned_text'])
-    tokenized_text_list = [word_tokenize(text) for text in tweet_text]
+    from gensim import models
+    tokenized_text_list = tweet_token_store.get_token_lists(df, token_store, tokenizer_name='word')
     bigram = models.phrases.Phrases(tokenized_text_list, min_count=5,
                                    threshold=100)  # higher threshold fewer phrases.
     bigram_mod = models.phrases.Phraser(bigram)
@@ -0,0 +1,82 @@
+import re
+import time
+import random
+
+import tweet_cleaning
+
+# The characters and words used to build the fixture corpus of raw Chinese tweets
+fixture_chinese_chars = '我愛香港的地鐵站今天很多人中文測試好開心黃埔何文田'
+fixture_words = ['MTR', 'HongKong', '#香港', '@user', 'http://t.co/abc', '2017', 'ok', 'lol']
+
+
+def encode_raw_chinese_char(character, random_generator):
+    # In the raw csv files, a Chinese character is saved either as its utf-8 bytes or as <U+XXXX>
+    if random_generator.random() < 0.5:
+        return character.encode('utf-8').decode('latin-1')
+    return '<U+{:04X}>'.format(ord(character))
+
+
+def encode_raw_emoji(emoji_encoding):
+    # The R encoding of an emoji, e.g. <ed><A0><BD><ed><B8><80>, saved as the raw bytes
+    return ''.join(chr(int(byte, 16)) for byte in re.findall('<([0-9A-Fa-f]{2})>', emoji_encoding))
+
+
+def build_fixture_corpus(emoji_decoder, tweet_number, seed=0):
+    """
+    Build a fixture corpus of raw Chinese tweets, mixing the Chinese characters, the English words and the emojis
+    :param emoji_decoder: an EmojiDecoder object
+    :param tweet_number: the number of tweets
+    :param seed: the random seed
+    :return: a list of raw tweet strings
+    """
+    random_generator = random.Random(seed)
+    emoji_encodings = [encoding for encoding in emoji_decoder.encoding_dict
+                       if re.fullmatch('(<[0-9A-Fa-f]{2}>)+', encoding)]
+    tweets = []
+    for _ in range(tweet_number):
+        parts = []
+        for _ in range(random_generator.randint(3, 15)):
+            choice = random_generator.random()
+            if choice < 0.6:
+                parts.append(''.join(encode_raw_chinese_char(character, random_generator) for character in
+                                     random_generator.sample(fixture_chinese_chars, random_generator.randint(1, 6))))
+            elif choice < 0.85:
+                parts.append(random_generator.choice(fixture_words))
+            else:
+                parts.append(encode_raw_emoji(random_generator.choice(emoji_encodings)))
+        tweets.append(' '.join(parts))
+    return tweets
+
+
+def validate_chinese_decoder(emoji_decoder=None, tweet_number=20000):
+    """
+    Check that decode_chinese_text gives the same output as the three step Chinese text restoration chain on the
+    fixture corpus, and compare their time
+    :param emoji_decoder: an EmojiDecoder object. If None, load it from read_data.tweet_2017
+    :param tweet_number: the number of tweets in the fixture corpus
+    :return: the time of the three step chain and the time of the decoder in seconds
+    """
+    if emoji_decoder is None:
+        emoji_decoder = tweet_cleaning.load_emoji_decoder()
+    tweets = [tweet_cleaning.show_emoji_in_tweet(tweet, emoji_decoder)
+              for tweet in build_fixture_corpus(emoji_decoder, tweet_number)]
+
+    start_time = time.perf_counter()
+    three_step_result = [tweet_cleaning.show_chinese_step3(tweet_cleaning.show_chinese_step2(
+        tweet_cleaning.show_chinese_step1(tweet, emoji_decoder.emoji_list))) for tweet in tweets]
+    three_step_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    decoder_result = [tweet_cleaning.decode_chinese_text(tweet, emoji_decoder) for tweet in tweets]
+    decoder_time = time.perf_counter() - start_time
+
+    mismatch_number = sum(old != new for old, new in zip(three_step_result, decoder_result))
+    assert mismatch_number == 0, '{} tweets are decoded differently'.format(mismatch_number)
+    print('Three step chain: {:.2f} seconds for {} tweets'.format(three_step_time, tweet_number))
+    print('Chinese decoder: {:.2f} seconds for {} tweets'.format(decoder_time, tweet_number))
+    print('Speedup: {:.1f}x'.format(three_step_time / decoder_time))
+    return three_step_time, decoder_time
+
+
+if __name__ == '__main__':
+    validate_chinese_decoder()
@@ -16,6 +16,7 @@ import time
 import csv
 import read_data
 import utils
+import tweet_embedding
 
 from sklearn.utils import shuffle
 
@@ -53,27 +54,26 @@ def read_local_csv_file(path, filename):
     return dataframe
 
 
-def prepare_tweet_vector_averages_for_prediction(tweets, p2v):
+def prepare_tweet_vector_averages_for_prediction(tweets, p2v, token_lists=None):
     """
     Take the vector sum of all tokens in each tweet
 
     Args:
         tweets: All tweets
         p2v: Phrase2Vec model
+        token_lists: the token lists of the tweets read from the tweet token store. If None, tokenize the tweets
 
     Returns:
-        Average vectors for each tweet
-        Truth
+        Average vectors for each tweet. The tweets without any token get a zero vector
     """
-    tokenizer = tk.TweetTokenizer(preserve_case=False, reduce_len=True, strip_handles=True)
+    if token_lists is None:
+        tokenizer = tk.TweetTokenizer(preserve_case=False, reduce_len=True, strip_handles=True)
+        token_lists = [tokenizer.tokenize(tweet) for tweet in tweets]
 
-    avg_vecs = list()
+    # Each distinct token is looked up once in p2v. See tweet_embedding.py
+    avg_vecs = tweet_embedding.EmbeddingEngine(p2v).embed_token_lists(token_lists)
 
-    for tweet in tweets:
-        tokens = tokenizer.tokenize(tweet)
-        avg_vecs.append(np.sum([p2v[x] for x in tokens], axis=0) / len(tokens))
-
-    return avg_vecs
+    return list(avg_vecs)
 
 
 # construct the whole review and sample datasets: sample for prediction; review for validation
@@ -105,19 +105,20 @@ if __name__ == '__main__':
     # Load the FastText word vectors and emoji vectors
     w2v = gs.FastText.load(os.path.join(w2v_path, 'fasttext_model'))
     e2v_ours = gs.KeyedVectors.load_word2vec_format(e2v_ours_path, binary=True)
-    # Combine the word vectors and emoji vectors together
+    # Combine the word vectors and emoji vectors together. The vector of each distinct token is computed once
+    # for the vector table, so the OOV cache(tweet_embedding.CachedWordVectors) is not used here
     p2v_our_emoji = p2v.Phrase2Vec(out_dim, w2v, e2v=e2v_ours)
 
     # #=========================For the unprocessed text========================================
     tweet_combined_dataframe = utils.read_local_csv_file(path=read_data.tweet_combined_path,
                                                  filename='tweet_combined_cleaned_translated.csv')
-    text_unprocessed = list(tweet_combined_dataframe['cleaned_text'])
-    #
-    tweet_array = prepare_tweet_vector_averages_for_prediction(text_unprocessed, p2v_our_emoji)
-    tweet_repre = list_of_array_to_array(tweet_array)
-
-    np.save(os.path.join(read_data.tweet_combined_path, 'tweet_representations', 'tweet_combined_repre.npy'),
-            tweet_repre)
+    # The tweets are tokenized once by tweet_token_store.py with the TweetTokenizer. The vectors of the token store
+    # vocabulary are saved once in tweet_combined_repre_vector_table.npy, and the tweets are averaged by the worker
+    # processes which open it as a read-only memmap. The vectors are written into tweet_combined_repre.npy, and the
+    # id_str of its rows into tweet_combined_repre_id_str.npy
+    tweet_embedding.write_tweet_vectors_in_parallel(tweet_combined_dataframe, p2v_our_emoji,
+                                                    vector_path=read_data.tweet_combined_representation,
+                                                    tokenizer_name='tweet', dimension=out_dim)
 
 
 
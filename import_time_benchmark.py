@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import subprocess
+
+# The modules which provide the aggregation API used by the batch jobs and the pool workers
+aggregation_modules = ['read_data', 'utils', 'tweet_store', 'tweet_ingestion', 'tweet_cleaning',
+                       'tweet_cleaning_cache', 'sentiment_computation']
+# The heavy machine learning and plotting packages which should not be loaded by the aggregation modules
+heavy_packages = ['keras', 'tensorflow', 'spacy', 'gensim', 'sklearn', 'matplotlib', 'seaborn', 'adjustText',
+                  'geopy']
+# The time budget(in seconds) of importing one aggregation module in a fresh python interpreter
+import_time_budget = 1.0
+
+# The code run in the fresh python interpreter. It prints the import time and the heavy packages being loaded
+measure_code = """
+import sys, time, json
+start_time = time.perf_counter()
+import {module_name}
+import_time = time.perf_counter() - start_time
+print(json.dumps({{'import_time': import_time,
+                  'heavy_packages': [name for name in {heavy_packages} if name in sys.modules]}}))
+"""
+
+
+def measure_import_time(module_name, repeat=3):
+    """
+    Measure the time of importing one module in fresh python interpreters
+    :param module_name: the name of the module
+    :param repeat: the number of runs. The fastest run is reported
+    :return: the import time in seconds and the heavy packages loaded by importing the module
+    """
+    code = measure_code.format(module_name=module_name, heavy_packages=heavy_packages)
+    import_time_list = []
+    loaded_heavy_packages = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        import_time_list.append(result['import_time'])
+        loaded_heavy_packages = result['heavy_packages']
+    return min(import_time_list), loaded_heavy_packages
+
+
+def check_import_time(module_names=None, budget=import_time_budget):
+    """
+    Check that importing each aggregation module stays under the time budget and loads no heavy package
+    :param module_names: the names of the checked modules. If None, use the aggregation_modules
+    :param budget: the time budget in seconds
+    :return: a dict whose keys are the module names and values are the import times
+    """
+    if module_names is None:
+        module_names = aggregation_modules
+    import_time_dict = {}
+    for module_name in module_names:
+        import_time, loaded_heavy_packages = measure_import_time(module_name)
+        import_time_dict[module_name] = import_time
+        print('Importing {} takes {:.3f} seconds'.format(module_name, import_time))
+        assert not loaded_heavy_packages, 'Importing {} loads the heavy packages: {}'.format(
+            module_name, loaded_heavy_packages)
+        assert import_time < budget, 'Importing {} takes {:.3f} seconds, more than the budget {} seconds'.format(
+            module_name, import_time, budget)
+    return import_time_dict
+
+
+if __name__ == '__main__':
+    check_import_time()
+    print('All the aggregation modules are imported within {} seconds'.format(import_time_budget))
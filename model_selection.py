@@ -7,7 +7,6 @@
 # Impore Relevant Packages
 # Commonly used
 import os
-import gensim.models as gs
 import numpy as np
 import pandas as pd
 from collections import Counter
@@ -16,43 +15,13 @@ import read_data
 import utils
 import csv
 
-# Classifiers
-from sklearn.model_selection import cross_validate
-from sklearn.ensemble import RandomForestClassifier
-from sklearn import svm
-from sklearn import tree
-from sklearn.utils import shuffle, compute_class_weight
-
 # Model Evaluations
 from sklearn.metrics import accuracy_score, f1_score, confusion_matrix, precision_score, recall_score, \
     classification_report
 from sklearn.model_selection import GridSearchCV, train_test_split, StratifiedKFold
 
-# This paper requires
-import phrase2vec as p2v
-from twitter_sentiment_dataset import TweetTrainingExample
-from model import ModelParams
-
-# Build my classifier
-from keras.utils.np_utils import to_categorical
-from keras.preprocessing.text import Tokenizer
-from keras import backend as K
-from keras import models
-from keras import layers
-from keras.wrappers.scikit_learn import KerasClassifier
-from tensorflow.keras import backend
-from tensorflow import set_random_seed
-
-# tokenization
-import nltk.tokenize as tk
-
-# Cope with the imbalanced issue
-from imblearn.pipeline import make_pipeline
-from imblearn.over_sampling import ADASYN, SMOTE, RandomOverSampler
-from imblearn.metrics import geometric_mean_score
-
-# Visualization
-from matplotlib import pyplot as plt
+# keras, tensorflow, gensim, imblearn and the classifiers are only needed when the models are built or trained.
+# They are imported in the functions below and in the main block rather than when this module is imported
 
 # Ignore the tedious warnings
 import warnings
@@ -73,6 +42,20 @@ def list_of_array_to_array(list_array):
     return arr
 
 
+def predict_in_chunks(clf, tweets_array, chunk_size=100000):
+    """
+    Make predictions chunk by chunk. If tweets_array is opened with mmap_mode='r', only one chunk of it is read into
+    memory at a time
+    :param clf: a fitted classifier
+    :param tweets_array: a numpy array(or memmap) of the tweet representations
+    :param chunk_size: the number of tweets predicted at once
+    :return: a numpy array of the predictions
+    """
+    predictions = [clf.predict(np.asarray(tweets_array[start:start + chunk_size]))
+                   for start in range(0, tweets_array.shape[0], chunk_size)]
+    return np.concatenate(predictions) if predictions else np.array([])
+
+
 def precision(y_true, y_pred):
     """Precision metric.
 
@@ -81,6 +64,7 @@ def precision(y_true, y_pred):
     Computes the precision, a metric for multi-label classification of
     how many selected items are relevant.
     """
+    from keras import backend as K
     true_positives = K.sum(K.round(K.clip(y_true * y_pred, 0, 1)))
     predicted_positives = K.sum(K.round(K.clip(y_pred, 0, 1)))
     precision = true_positives / (predicted_positives + K.epsilon())
@@ -95,6 +79,7 @@ def recall(y_true, y_pred):
     Computes the recall, a metric for multi-label classification of
     how many relevant items are selected.
     """
+    from keras import backend as K
     true_positives = K.sum(K.round(K.clip(y_true * y_pred, 0, 1)))
     possible_positives = K.sum(K.round(K.clip(y_true, 0, 1)))
     recall = true_positives / (possible_positives + K.epsilon())
@@ -102,6 +87,8 @@ def recall(y_true, y_pred):
 
 
 def f1(y_true, y_pred):
+    from keras import backend as K
+
     def recall(y_true, y_pred):
         """Recall metric.
 
@@ -144,6 +131,7 @@ def weighted_categorical_crossentropy(weights):
         loss = weighted_categorical_crossentropy(weights)
         model.compile(loss=loss,optimizer='adam')
     """
+    from keras import backend as K
 
     weights = K.variable(weights)
 
@@ -161,6 +149,8 @@ def weighted_categorical_crossentropy(weights):
 
 
 def get_ffnn_model(dropout_rate=0.2):
+    from keras import models
+    from keras import layers
     model = models.Sequential()
     # Dense(1000) is a fully-connected layer with 1000 hidden units.
     # in the first layer, you must specify the expected input data shape:
@@ -189,7 +179,8 @@ def kfold_with_smote(clf, train_valid_data_X, train_valid_label_y, tuned_paramet
     tuned_parameters: the hyperparameters we want to tune
     X_test: the test data
     y_test: the test labels
-    whole_tweets_array: a numpy array which records the representations of tweets
+    whole_tweets_array: a numpy array which records the representations of tweets. It could be opened with
+    mmap_mode='r' since the predictions are made chunk by chunk
     save_path: the path used to save predictions
     clf_name: the name of the classifier
     Return: two dictionaries: 1. the best hyperparameters in cross validation; 2. the mean test score in
@@ -258,7 +249,7 @@ def kfold_with_smote(clf, train_valid_data_X, train_valid_label_y, tuned_paramet
         np.save(os.path.join(save_path, 'whole_predictions_by_' + clf_name +'_review'), whole_predictions_review)
 
         # Make predictions on the whole 2017 data
-        whole_predictions_combined = Grid_clf.predict(whole_tweets_array)
+        whole_predictions_combined = predict_in_chunks(Grid_clf, whole_tweets_array)
         print('The sentiment distribution of the combined tweet dataframe is:')
         print(Counter(whole_predictions_combined))
         np.save(os.path.join(save_path, 'whole_predictions_tweet_combined_by_' + clf_name), whole_predictions_combined)
@@ -267,6 +258,14 @@ def kfold_with_smote(clf, train_valid_data_X, train_valid_label_y, tuned_paramet
 
 
 if __name__ == '__main__':
+    # Classifiers
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn import svm
+    from sklearn import tree
+    # Cope with the imbalanced issue
+    from imblearn.over_sampling import SMOTE
+    # The KerasClassifier Wrapper helps us GridSearch the hyperparameters of our neural net
+    from keras.wrappers.scikit_learn import KerasClassifier
 
     # Use kfold with GridSearch to compare the performance of different classification methods
     print("========================================================================")
@@ -284,9 +283,8 @@ if __name__ == '__main__':
     # Load the data and label for test
     X_test = np.load(os.path.join(read_data.tweet_representation_path, 'test_data_for_model_compare.npy'))
     y_test = np.load(os.path.join(read_data.tweet_representation_path, 'test_label_for_model_compare.npy'))
-    # Load the data for the whole tweet combined array
-    whole_combined_array = np.load(os.path.join(read_data.tweet_combined_path, 'tweet_representations',
-                                                'tweet_combined_repre.npy'))
+    # Open the whole tweet combined array as a memmap. Only the chunks being predicted are read from the disk
+    whole_combined_array = np.load(read_data.tweet_combined_representation, mmap_mode='r')
 
     # Use SMOTE to do the oversampling
     smt = SMOTE(random_state=random_seed, k_neighbors=1)
@@ -1,44 +1,114 @@
-import pandas as pd
 import os
+from functools import lru_cache
+
+# Nothing is read from the disk when this module is imported. The station and TPU tables are loaded by the
+# load_* functions below the first time they are needed and then cached
+
+# The paths could be set by environment variables named as the upper case path names with the
+# SOCIAL_MEDIA_ prefix, e.g. SOCIAL_MEDIA_TWEET_2017. Otherwise the default paths are used
+environment_variable_prefix = 'SOCIAL_MEDIA_'
+
+
+def get_path(name, default_path):
+    return os.environ.get(environment_variable_prefix + name.upper(), default_path)
+
 
 # Paths for reading and saving
 # Save the plots
-plot_path = r'XXXXX'
+plot_path = get_path('plot_path', r'XXXXX')
 # The word vectors
-word_vector_path = r'XXXXX'
+word_vector_path = get_path('word_vector_path', r'XXXXX')
 # Desktop
-desktop = r'XXXXX'
+desktop = get_path('desktop', r'XXXXX')
 # Tweet 2016 Path
-tweet_2016 = r'XXXXX'
+tweet_2016 = get_path('tweet_2016', r'XXXXX')
+# The raw Sentiment140 csv file and the cleaned Sentiment140 corpus(one tweet per line) used to train the fastText
+sentiment140_raw = get_path('sentiment140_raw', os.path.join(tweet_2016, 'training.1600000.processed.noemoticon.csv'))
+sentiment140_corpus = get_path('sentiment140_corpus', os.path.join(tweet_2016, 'sentiment_cleaned_text.txt'))
 # Tweet 2017 Path
-tweet_2017 = r'XXXXX'
+tweet_2017 = get_path('tweet_2017', r'XXXXX')
+# Paths which save the raw tweet csv files collected in 2016, 2017 and 2018
+tweet_2016_raw = get_path('tweet_2016_raw', r'XXXXX')
+tweet_2017_raw = get_path('tweet_2017_raw', r'XXXXX')
+tweet_2018_raw = get_path('tweet_2018_raw', r'XXXXX')
+# Path which saves the combined 2016, 2017 and 2018 tweets
+tweet_combined_path = get_path('tweet_combined_path', r'XXXXX')
+# Path of the partitioned columnar tweet store(one parquet dataset for each saved tweet table)
+tweet_store_path = get_path('tweet_store_path', r'XXXXX')
+# Path of the sqlite database which caches the cleaned tweet text
+cleaned_text_cache_path = get_path('cleaned_text_cache_path', r'XXXXX')
+# Path of the token stores(the tokens of the cleaned tweets saved as vocabulary ids)
+token_store_path = get_path('token_store_path', r'XXXXX')
+# Paths which save the cleaned 2017 tweets of each station and the ones without the accounts posting at the same place
+station_related_2017_zh_en_cleaned = get_path('station_related_2017_zh_en_cleaned', r'XXXXX')
+station_related_2017_without_same_geo = get_path('station_related_2017_without_same_geo', r'XXXXX')
 # Path used to save the Chinese tweets and English tweets in each transit neighborhood based on the tweet geoinformation
-station_related_path_zh_en = r'XXXXX'
+station_related_path_zh_en = get_path('station_related_path_zh_en', r'XXXXX')
 # Path to generate the data for human review
-prepare_for_the_review_path = r'XXXXX'
+prepare_for_the_review_path = get_path('prepare_for_the_review_path', r'XXXXX')
 # Save the human reviewed dataset
-review_path = r'XXXXX'
+review_path = get_path('review_path', r'XXXXX')
 # Save the result from human review
-human_review_result_path = r'XXXXX'
+human_review_result_path = get_path('human_review_result_path', r'XXXXX')
 # Save the topic modelling result
-topic_modelling_path = r'XXXXX'
-before_and_after_topic_modelling_compare = r'XXXXX'
+topic_modelling_path = get_path('topic_modelling_path', r'XXXXX')
+before_and_after_topic_modelling_compare = get_path('before_and_after_topic_modelling_compare', r'XXXXX')
 # Save plots generated by LDA
-lda_plot_path = r'XXXXX'
+lda_plot_path = get_path('lda_plot_path', r'XXXXX')
 # Save the result derived from ArcGis
-arcgis_path = r'XXXXX'
+arcgis_path = get_path('arcgis_path', r'XXXXX')
 # Save the tweet representations
-tweet_representation_path = r'XXXXX'
-transit_non_transit_comparison_before_after = \
-    r'XXXXX'
-transit_non_transit_comparison_cross_sectional = \
-    r'XXXXX'
+tweet_representation_path = get_path('tweet_representation_path', r'XXXXX')
+# The representations of the combined tweets(one float32 npy array, opened as a memmap) and the id_str of its rows
+# are saved in tweet_combined_repre.npy and tweet_combined_repre_id_str.npy
+tweet_combined_representation = get_path('tweet_combined_representation',
+                                         os.path.join(tweet_combined_path, 'tweet_representations',
+                                                      'tweet_combined_repre.npy'))
+# Save the TN TPUs and non-TN TPUs
+transit_non_transit_comparison = get_path('transit_non_transit_comparison', r'XXXXX')
+transit_non_transit_comparison_before_after = get_path('transit_non_transit_comparison_before_after', r'XXXXX')
+transit_non_transit_comparison_cross_sectional = get_path('transit_non_transit_comparison_cross_sectional', r'XXXXX')
 
 
 # The location of the stations
 # The 'station_location.csv' file contains the name of stations as well as their corresponding geoinformation, which could be found
 # in the Datasets folder
-location_df = pd.read_csv(os.path.join(tweet_2017, 'station_location.csv'))
-location_stations = {}
-for _, row in location_df.iterrows():
-    location_stations[row['Name']] = (row['lat'], row['lon'])
+@lru_cache(maxsize=None)
+def load_station_locations():
+    """
+    Load the name and the location of the stations
+    :return: a dict whose keys are the station names and values are the (lat, lon) tuples
+    """
+    import pandas as pd
+    location_df = pd.read_csv(os.path.join(tweet_2017, 'station_location.csv'))
+    return dict(zip(location_df['Name'], zip(location_df['lat'], location_df['lon'])))
+
+
+# The csv file which saves the names of TPUs used in the cross sectional study
+@lru_cache(maxsize=None)
+def load_tpu_names():
+    import pandas as pd
+    tpu_dataframe = pd.read_csv(os.path.join(transit_non_transit_comparison_cross_sectional,
+                                             'cross_sectional_independent_variables', 'tpu_names.csv'),
+                                encoding='utf-8')
+    return list(tpu_dataframe['TPU Names'])
+
+
+# The TN TPUs and non-TN TPUs used in the cross sectional study
+@lru_cache(maxsize=None)
+def load_tn_tpus():
+    import numpy as np
+    return frozenset(np.load(os.path.join(transit_non_transit_comparison, 'tn_tpus.npy')))
+
+
+@lru_cache(maxsize=None)
+def load_non_tn_tpus():
+    import numpy as np
+    return frozenset(np.load(os.path.join(transit_non_transit_comparison, 'non_tn_tpus.npy')))
+
+
+def __getattr__(name):
+    # Keep read_data.location_stations available without loading the csv file at import time
+    if name == 'location_stations':
+        return load_station_locations()
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
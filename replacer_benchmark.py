@@ -0,0 +1,51 @@
+import time
+import random
+
+import utils
+
+# The size of the Sentiment140 dataset
+sentiment140_size = 1600000
+# The words used to build the synthetic tweets. Some of them are matched by the replacement patterns
+benchmark_words = ['I', 'love', 'this', 'moment!', 'the', 'MTR', 'station', 'is', 'so', 'crowded', 'today',
+                   "can't", "won't", "I'm", "it's", "don't", "we'll", "they're", "I've", "you'd", '10k', 'runners',
+                   '#HongKong', '@user', 'http://t.co/abc', 'café', '...', ':)', 'lol', 'haha', 'good', 'morning']
+
+
+def build_synthetic_tweets(tweet_number, seed=0):
+    """
+    Build the synthetic tweets with a similar length as the Sentiment140 tweets
+    :param tweet_number: the number of tweets
+    :param seed: the random seed
+    :return: a list of tweet strings
+    """
+    random_generator = random.Random(seed)
+    return [' '.join(random_generator.choice(benchmark_words) for _ in range(random_generator.randint(5, 25)))
+            for _ in range(tweet_number)]
+
+
+def compare_replacers(tweet_number=sentiment140_size):
+    """
+    Compare the time of the fused RegexpReplacer with applying the replacement patterns one by one
+    :param tweet_number: the number of synthetic tweets
+    :return: the time of the sequential replacement and the time of the fused replacement in seconds
+    """
+    tweets = build_synthetic_tweets(tweet_number)
+    replacer = utils.RegexpReplacer()
+
+    start_time = time.perf_counter()
+    sequential_result = [replacer.replace_sequentially(tweet) for tweet in tweets]
+    sequential_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    fused_result = [replacer.replace(tweet) for tweet in tweets]
+    fused_time = time.perf_counter() - start_time
+
+    assert sequential_result == fused_result, 'The fused replacer changes the cleaned text'
+    print('Sequential replacement: {:.2f} seconds for {} tweets'.format(sequential_time, tweet_number))
+    print('Fused replacement: {:.2f} seconds for {} tweets'.format(fused_time, tweet_number))
+    print('Speedup: {:.1f}x'.format(sequential_time / fused_time))
+    return sequential_time, fused_time
+
+
+if __name__ == '__main__':
+    compare_replacers()
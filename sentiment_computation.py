@@ -1,7 +1,6 @@
 # Commonly used
 import numpy as np
 import pandas as pd
-from pandas.plotting import parallel_coordinates
 import os
 import time
 import re
@@ -9,24 +8,8 @@ import string
 import read_data
 from collections import Counter
 
-# A package which could deal with emojis
-import emoji
-
-# keras is used to construct the neural nets
-import keras.backend as K
-from keras.preprocessing.text import Tokenizer
-from keras.preprocessing.sequence import pad_sequences
-from keras.models import Sequential, Model, load_model
-from keras.utils import to_categorical
-from keras.layers import Dense, Embedding, LSTM, Bidirectional, Flatten, Input, BatchNormalization, Dropout, Conv1D, MaxPooling1D
-
-# Draw the plot
-import matplotlib
-from matplotlib import pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap, ListedColormap
-
-# Adjust text
-from adjustText import adjust_text
+# The aggregation functions below only need pandas. The plotting packages(matplotlib, adjustText) are
+# imported inside the plotting functions, so that importing this module stays cheap for the batch jobs
 
 
 # Load all the necessary paths
@@ -260,6 +243,9 @@ def select_stations_for_overall_sentiment_plot(sentiment_dict, activity_dict, hu
 
 def plot_overall_sentiment_for_whole_tweets(df, y_label_name, figure_title=None, saved_file_name=None,
                                             without_outlier = False):
+    from matplotlib import pyplot as plt
+    # Adjust text
+    from adjustText import adjust_text
     fig, ax = plt.subplots(figsize=(10,10))
     if without_outlier:
         # outliers: these transit neighborhoods have very high pos/neg
@@ -290,6 +276,7 @@ def plot_overall_sentiment_for_whole_tweets(df, y_label_name, figure_title=None,
 
 def plot_heatmap(df, y_label, file_name):
     # plot the heatmap of sentiment or activity level of the selected transit neighborhooods on a monthly basis
+    from matplotlib import pyplot as plt
     plt.rcParams['xtick.top'] = True
     df = df.reindex(df.mean(axis=1).sort_values(ascending=False).index)
     sentiment_values = df.values
@@ -322,6 +309,7 @@ def plot_heatmap(df, y_label, file_name):
 
 def plot_line_graph(df, figure_title_name, local_figure_name):
     # plot the linegraph of sentiment of the selected transit neighborhooods on a monthly basis
+    from matplotlib import pyplot as plt
     plt.subplots(figsize=(10, 10))
     months = list(range(1, 13))
     values = df.values
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of this repository are saved in the root directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
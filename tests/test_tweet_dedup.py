@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+import tweet_dedup
+
+# Large ids close to the real ones, which do not fit in a float64 exactly
+inserted_ids = np.arange(20000, dtype=np.int64) * 7919 + 1234567890123456789 - 10 ** 9
+other_ids = inserted_ids + 1
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = tweet_dedup.BloomFilter(len(inserted_ids))
+    bloom_filter.add(inserted_ids)
+    assert bloom_filter.might_contain(inserted_ids).all()
+    # About 1% false positives with 10 bits per id
+    assert bloom_filter.might_contain(other_ids).mean() < 0.05
+
+
+def test_id_index_contains_inserted_ids():
+    for use_bloom_filter in [False, True]:
+        id_index = tweet_dedup.IdStrIndex(inserted_ids[:10000], use_bloom_filter=use_bloom_filter)
+        id_index.add(inserted_ids[10000:])
+        assert id_index.contains(inserted_ids).all()
+        assert not id_index.contains(other_ids).any()
+
+
+def test_drop_duplicate_tweets():
+    dataframe = pd.DataFrame({'id_str': ['1234567890123456789', '1234567890123456788', None,
+                                         '1234567890123456789']})
+    id_index = tweet_dedup.IdStrIndex(np.array([1234567890123456788], dtype=np.int64))
+    dataframe_without_duplicates, duplicate_count = tweet_dedup.drop_duplicate_tweets(dataframe, id_index)
+    assert duplicate_count == 2
+    # The tweets without an id_str are kept
+    assert dataframe_without_duplicates['id_str'].iloc[0] == '1234567890123456789'
+    assert dataframe_without_duplicates['id_str'].iloc[1:].isnull().all()
+    assert id_index.contains(np.array([1234567890123456789], dtype=np.int64)).all()
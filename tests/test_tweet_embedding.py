@@ -0,0 +1,29 @@
+import numpy as np
+
+import tweet_embedding
+import tweet_token_store
+
+embedding_matrix = np.array([[1, 0], [0, 2], [3, 3]], dtype=np.float32)
+
+
+def test_average_token_ids_with_empty_tweets():
+    token_ids = np.array([0, 1, 2, 2], dtype=np.int32)
+    offsets = np.array([0, 0, 2, 2, 3, 4, 4], dtype=np.int64)
+    for chunk_size in [1, 2, 100]:
+        tweet_vectors = tweet_embedding.average_token_ids(embedding_matrix, token_ids, offsets,
+                                                          chunk_size=chunk_size)
+        assert np.allclose(tweet_vectors, [[0, 0], [0.5, 1], [0, 0], [3, 3], [3, 3], [0, 0]])
+
+
+def test_average_token_ids_without_tokens():
+    tweet_vectors = tweet_embedding.average_token_ids(embedding_matrix, np.array([], dtype=np.int32),
+                                                      np.zeros(4, dtype=np.int64))
+    assert tweet_vectors.shape == (3, 2)
+    assert not tweet_vectors.any()
+
+
+def test_embed_token_store_positions():
+    token_store = tweet_token_store.build_token_store(['a b', '', 'c'], ['1', '2', '3'],
+                                                      tokenizer_name='whitespace')
+    tweet_vectors = tweet_embedding.embed_token_store(embedding_matrix, token_store, positions=np.array([2, 1, 0]))
+    assert np.allclose(tweet_vectors, [[3, 3], [0, 0], [0.5, 1]])
@@ -0,0 +1,64 @@
+import os
+import csv
+
+import pandas as pd
+
+import tweet_ingestion
+import tweet_store
+
+
+# Save a raw tweet csv file with the given id_str values, as the tweet collection script does
+def write_raw_csv(file_path, id_strs):
+    pd.DataFrame({
+        'created_at': ['Wed Oct 10 20:19:{:02d} +0000 2018'.format(second) for second in range(len(id_strs))],
+        'id_str': id_strs,
+        'lang': ['en'] * len(id_strs),
+        'lat': ['22.3'] * len(id_strs),
+        'lon': ['114.1'] * len(id_strs),
+        'text': ['hello'] * len(id_strs),
+        'verified': ['FALSE'] * len(id_strs),
+        'user_id_str': ['5'] * len(id_strs)}).to_csv(file_path, quoting=csv.QUOTE_NONNUMERIC, index=False)
+
+
+def read_ingested_ids(store_path):
+    return tweet_store.read_tweet_store('t', columns=['id_str'], store_path=store_path)['id_str'].tolist()
+
+
+def test_duplicates_are_dropped(tmp_path):
+    raw_path, store_path = tmp_path / 'raw', str(tmp_path / 'store')
+    raw_path.mkdir()
+    write_raw_csv(str(raw_path / 'a.csv'), ['1234567890123456781', '1234567890123456782', '1234567890123456781'])
+    write_raw_csv(str(raw_path / 'b.csv'), ['1234567890123456782', '1234567890123456783'])
+    tweet_number = tweet_ingestion.load_raw_tweets_to_store(str(raw_path), table_name='t', store_path=store_path,
+                                                            workers=1)
+    assert tweet_number == 3
+    assert sorted(read_ingested_ids(store_path)) == [1234567890123456781, 1234567890123456782, 1234567890123456783]
+
+
+def test_rerun_does_not_duplicate_tweets(tmp_path):
+    raw_path, store_path = tmp_path / 'raw', str(tmp_path / 'store')
+    raw_path.mkdir()
+    write_raw_csv(str(raw_path / 'a.csv'), ['1234567890123456781', '1234567890123456782'])
+    for _ in range(2):
+        tweet_ingestion.load_raw_tweets_to_store(str(raw_path), table_name='t', store_path=store_path, workers=1)
+        assert len(read_ingested_ids(store_path)) == 2
+    # An incremental run without new raw files writes nothing
+    assert tweet_ingestion.load_raw_tweets_to_store(str(raw_path), table_name='t', store_path=store_path,
+                                                    workers=1, incremental=True) == 0
+    assert len(read_ingested_ids(store_path)) == 2
+
+
+def test_incremental_run_only_adds_new_tweets(tmp_path):
+    raw_path, store_path = tmp_path / 'raw', str(tmp_path / 'store')
+    raw_path.mkdir()
+    write_raw_csv(str(raw_path / 'a.csv'), ['1234567890123456781', '1234567890123456782'])
+    tweet_ingestion.load_raw_tweets_to_store(str(raw_path), table_name='t', store_path=store_path, workers=1)
+    # The new raw file overlaps with the ingested one
+    write_raw_csv(str(raw_path / 'b.csv'), ['1234567890123456782', '1234567890123456783'])
+    tweet_number = tweet_ingestion.load_raw_tweets_to_store(str(raw_path), table_name='t', store_path=store_path,
+                                                            workers=1, incremental=True)
+    assert tweet_number == 1
+    assert sorted(read_ingested_ids(store_path)) == [1234567890123456781, 1234567890123456782, 1234567890123456783]
+    manifest = tweet_store.load_store_manifest('t', store_path)
+    assert sorted(os.path.basename(file_path) for file_path in manifest['processed_files']) == ['a.csv', 'b.csv']
+    assert manifest['id_str_watermark'] == 1234567890123456783
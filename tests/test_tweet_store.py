@@ -0,0 +1,45 @@
+import pandas as pd
+
+import tweet_store
+
+
+# Build a small tweet dataframe whose hk_time strings look like the ones saved in the csv files
+def make_tweet_dataframe(id_strs, months):
+    return pd.DataFrame({
+        'id_str': [str(id_str) for id_str in id_strs],
+        'user_id_str': ['5'] * len(id_strs),
+        'hk_time': ['2017-{:02d}-01 00:00:00+08:00'.format(month) for month in months],
+        'year': ['2017.0'] * len(id_strs),
+        'month': ['{}.0'.format(month) for month in months],
+        'month_plus_year': ['2017_{}'.format(month) for month in months],
+        'text': ['tweet {}'.format(id_str) for id_str in id_strs]})
+
+
+def test_round_trip_keeps_time_order(tmp_path):
+    first_dataframe = make_tweet_dataframe([1234567890123456789, 1234567890123456700, 1234567890123456701],
+                                           [2, 10, 2])
+    second_dataframe = make_tweet_dataframe([1234567890123456600, 1234567890123456800], [1, 11])
+    tweet_store.write_tweet_store(first_dataframe, 't', store_path=str(tmp_path))
+    tweet_store.write_tweet_store(second_dataframe, 't', store_path=str(tmp_path))
+    dataframe = tweet_store.read_tweet_store('t', store_path=str(tmp_path))
+    assert dataframe['id_str'].tolist() == [1234567890123456600, 1234567890123456701, 1234567890123456789,
+                                            1234567890123456700, 1234567890123456800]
+    assert dataframe['month'].tolist() == [1, 2, 2, 10, 11]
+    assert dataframe['hk_time'].is_monotonic_increasing
+    assert list(dataframe['month_plus_year'].cat.categories) == ['2017_1', '2017_2', '2017_10', '2017_11']
+    assert dataframe.index.tolist() == list(range(5))
+
+
+def test_read_columns_keeps_time_order(tmp_path):
+    tweet_store.write_tweet_store(make_tweet_dataframe([3, 2, 1], [10, 2, 2]), 't', store_path=str(tmp_path))
+    dataframe = tweet_store.read_tweet_store('t', columns=['text', 'month_plus_year'], store_path=str(tmp_path))
+    assert dataframe.columns.tolist() == ['text', 'month_plus_year']
+    assert dataframe['text'].tolist() == ['tweet 1', 'tweet 2', 'tweet 3']
+    assert dataframe['month_plus_year'].astype(str).tolist() == ['2017_2', '2017_2', '2017_10']
+
+
+def test_overwrite_replaces_table(tmp_path):
+    dataframe = make_tweet_dataframe([1, 2], [1, 2])
+    for _ in range(2):
+        tweet_store.write_tweet_store(dataframe, 't', store_path=str(tmp_path), overwrite=True)
+    assert tweet_store.read_tweet_store('t', store_path=str(tmp_path)).shape[0] == 2
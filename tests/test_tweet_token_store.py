@@ -0,0 +1,33 @@
+import numpy as np
+
+import tweet_token_store
+
+texts = ['the cat sat', '', 'the the dog', 'cat']
+id_strs = ['1234567890123456781', '1234567890123456782', '1234567890123456783', '1234567890123456784']
+
+
+def test_filter_tokens_offsets():
+    token_store = tweet_token_store.build_token_store(texts, id_strs, tokenizer_name='whitespace')
+    filtered_store = token_store.drop_terms({'the'})
+    assert filtered_store.offsets.tolist() == [0, 2, 2, 3, 4]
+    assert [filtered_store.get_tokens(position) for position in range(len(texts))] == [
+        ['cat', 'sat'], [], ['dog'], ['cat']]
+    # The tokens of the original store are kept
+    assert token_store.get_tokens(2) == ['the', 'the', 'dog']
+
+
+def test_get_positions_detects_changed_texts():
+    token_store = tweet_token_store.build_token_store(texts, id_strs, tokenizer_name='whitespace')
+    positions = token_store.get_positions(id_strs[::-1] + ['1'], texts=texts[::-1] + ['x'])
+    assert positions.tolist() == [3, 2, 1, 0, -1]
+    changed_texts = ['cat', 'the cat', '', 'the cat sat']
+    assert token_store.get_positions(id_strs[::-1], texts=changed_texts).tolist() == [3, -1, 1, 0]
+
+
+def test_save_and_load(tmp_path):
+    token_store = tweet_token_store.build_token_store(texts, id_strs, tokenizer_name='whitespace')
+    token_store.save(str(tmp_path))
+    loaded_store = tweet_token_store.TokenStore.load(str(tmp_path))
+    assert loaded_store.vocabulary == token_store.vocabulary
+    assert np.array_equal(loaded_store.offsets, token_store.offsets)
+    assert loaded_store.get_positions(id_strs, texts=texts).tolist() == [0, 1, 2, 3]
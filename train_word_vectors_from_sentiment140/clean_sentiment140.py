@@ -1,6 +1,8 @@
 import re
 import string
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem.wordnet import WordNetLemmatizer
@@ -49,11 +51,72 @@ def clean_raw_text(raw_text, caller, remove_stopwords=True, lemmatize = True):
     return ' '.join(result)
 
 
+# The columns of the raw Sentiment140 csv file
+sentiment140_columns = ['target', 'id', 'date', 'flag', 'user', 'text']
+
+
+def iter_sentiment140_text_chunks(source_path, chunk_size=50000):
+    """
+    Read the text of the Sentiment140 tweets in chunks
+    :param source_path: the path of the raw Sentiment140 csv file. A pickled dataframe is also accepted, but it
+    is loaded at once
+    :param chunk_size: the number of tweets in one chunk
+    :return: a generator of the lists of tweet texts
+    """
+    if source_path.endswith('.pkl'):
+        texts = list(pd.read_pickle(source_path)['text'])
+        for start in range(0, len(texts), chunk_size):
+            yield texts[start:start + chunk_size]
+    else:
+        for chunk in pd.read_csv(source_path, encoding='latin-1', header=None, names=sentiment140_columns,
+                                 usecols=['text'], dtype='str', keep_default_na=False, chunksize=chunk_size):
+            yield list(chunk['text'])
+
+
+def clean_text_chunk(texts):
+    return [clean_raw_text(raw_text=text, caller='bilstm') for text in texts]
+
+
+def write_cleaned_corpus(source_path, corpus_path, workers=None, chunk_size=50000, max_pending_chunks=None):
+    """
+    Clean the Sentiment140 tweets on a process pool and write them to a corpus file(one cleaned tweet per line)
+    which could be read by gensim LineSentence. Only the chunks being cleaned are kept in memory, and the chunks
+    are written in the order of the source file
+    :param source_path: the path of the raw Sentiment140 csv file
+    :param corpus_path: the path of the corpus file
+    :param workers: the number of worker processes. If None, use the number of cores
+    :param chunk_size: the number of tweets in one chunk
+    :param max_pending_chunks: the maximum number of chunks being cleaned ahead of the writer.
+    If None, use twice the number of workers
+    :return: the number of written tweets
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if max_pending_chunks is None:
+        max_pending_chunks = 2 * workers
+    tweet_number = 0
+    # Write to a temporary file first, so an interrupted job never leaves a truncated corpus
+    with open(corpus_path + '.tmp', 'w', encoding='utf-8') as corpus_file, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def write_first_pending_chunk():
+            cleaned_texts = pending.popleft().result()
+            corpus_file.write(''.join(text + '\n' for text in cleaned_texts))
+            return len(cleaned_texts)
+
+        for texts in iter_sentiment140_text_chunks(source_path, chunk_size=chunk_size):
+            pending.append(executor.submit(clean_text_chunk, texts))
+            if len(pending) >= max_pending_chunks:
+                tweet_number += write_first_pending_chunk()
+                print('{} tweets have been cleaned'.format(tweet_number))
+        while pending:
+            tweet_number += write_first_pending_chunk()
+    os.replace(corpus_path + '.tmp', corpus_path)
+    return tweet_number
+
+
 if __name__ == '__main__':
-    # Clean the Sentiment140 Dataset and Save
-    sentiment140 = pd.read_pickle(os.path.join(read_data.tweet_2016, 'sentiment140.pkl'))
-    # If caller = 'bilstm', the cleaned text is string. Otherwise it's list
-    sentiment140['text'] = sentiment140['text'].apply(lambda x: clean_raw_text(raw_text=x, caller='bilstm'),
-                                                      axis=1)
-    sentiment140_cleaned = sentiment140.copy()
-    sentiment140_cleaned.to_pickle(os.path.join(read_data.tweet_2016, 'sentiment140_cleaned.pkl'))
+    # Clean the Sentiment140 Dataset and save the corpus used to train the fastText model
+    cleaned_number = write_cleaned_corpus(read_data.sentiment140_raw, read_data.sentiment140_corpus)
+    print('{} cleaned tweets are saved to {}'.format(cleaned_number, read_data.sentiment140_corpus))
@@ -1,31 +1,159 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
 import time
 import os
+import json
+import glob
 import read_data
 
 from gensim.models import FastText
+from gensim.models.callbacks import CallbackAny2Vec
 from gensim.models.word2vec import LineSentence
 
-# Load the dataset
-sentiment140 = pd.read_pickle(os.path.join(read_data.tweet_2016,'sentiment140_cleaned.pkl'))
+# The file which records the number of finished epochs, the name of the latest checkpoint and the learning rate
+# schedule of the training run
+checkpoint_state_filename = 'checkpoint_state.json'
+checkpoint_model_prefix = 'fasttext_epoch_'
 
-if __name__ == '__main__':
-    all_text_list = list(sentiment140['text'])
 
-    with open(os.path.join(path, 'sentiment_cleaned_text.txt'), 'w') as f:
-        for text in all_text_list:
-            f.write("%s\n" % text)
+class CorpusSentences(object):
 
-    all_text = LineSentence(os.path.join(read_data.tweet_2016, 'sentiment_cleaned_text.txt'))
+    def __init__(self, corpus_paths):
+        """
+        Stream the sentences of one or more corpus files(one cleaned tweet per line, e.g. the file written by
+        clean_sentiment140.py). The corpus is read from the disk again in each epoch and never kept in memory
+        :param corpus_paths: a corpus path or a list of corpus paths
+        """
+        if isinstance(corpus_paths, str):
+            corpus_paths = [corpus_paths]
+        self.corpus_paths = list(corpus_paths)
 
-    print('Generating FastText Vectors ..')
-    # embedding size
-    start = time.time()
-    fasttext_model = FastText(size=100, window=3, min_count=1, iter=10)
-    fasttext_model.build_vocab(all_text)
-    fasttext_model.train(all_text, total_examples=fasttext_model.corpus_count, epochs=fasttext_model.iter)
+    def __iter__(self):
+        for corpus_path in self.corpus_paths:
+            for sentence in LineSentence(corpus_path):
+                yield sentence
+
+
+def load_checkpoint_state(checkpoint_path):
+    state_path = os.path.join(checkpoint_path, checkpoint_state_filename)
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as state_file:
+            return json.load(state_file)
+    return None
+
+
+def save_checkpoint(model, checkpoint_path, finished_epochs, schedule):
+    """
+    Save the model after an epoch. The state file is replaced only after the model is saved, so an interrupted save
+    never breaks the latest checkpoint. The older checkpoints are then removed
+    :param model: the FastText model
+    :param checkpoint_path: the directory which saves the checkpoints
+    :param finished_epochs: the number of finished epochs
+    :param schedule: a dict of the initial alpha, the min_alpha and the total epochs of the training run
+    """
+    os.makedirs(checkpoint_path, exist_ok=True)
+    model_filename = '{}{}.model'.format(checkpoint_model_prefix, finished_epochs)
+    model.save(os.path.join(checkpoint_path, model_filename))
+    state_path = os.path.join(checkpoint_path, checkpoint_state_filename)
+    with open(state_path + '.tmp', 'w', encoding='utf-8') as state_file:
+        json.dump({'finished_epochs': finished_epochs, 'model_filename': model_filename, 'schedule': schedule},
+                  state_file)
+    os.replace(state_path + '.tmp', state_path)
+    # gensim saves the large arrays of a model to separate files starting with the model filename
+    for old_path in glob.glob(os.path.join(checkpoint_path, checkpoint_model_prefix + '*')):
+        if not os.path.basename(old_path).startswith(model_filename):
+            os.remove(old_path)
+
+
+class EpochLogger(CallbackAny2Vec):
+
+    def __init__(self, checkpoint_path, finished_epochs, schedule):
+        """
+        Log the time and the words per second of each epoch and save a checkpoint after each epoch
+        :param checkpoint_path: the directory which saves the checkpoints
+        :param finished_epochs: the number of epochs finished before this training run
+        :param schedule: the learning rate schedule of the training run, saved with each checkpoint
+        """
+        self.checkpoint_path = checkpoint_path
+        self.finished_epochs = finished_epochs
+        self.schedule = schedule
+        self.epoch_start_time = None
 
-    print('FastText Created in {} seconds.'.format(time.time() - start))
+    def on_epoch_begin(self, model):
+        self.epoch_start_time = time.time()
 
-    fasttext_model.save(os.path.join(read_data.word_vector_path, 'fasttext_model'))
+    def on_epoch_end(self, model):
+        epoch_time = time.time() - self.epoch_start_time
+        self.finished_epochs += 1
+        # The training loss is not logged. The FastText model of gensim does not compute it and always reports 0
+        print('Epoch {}/{}: {:.1f} seconds, {:.0f} words/sec'.format(
+            self.finished_epochs, self.schedule['epochs'], epoch_time, model.corpus_total_words / epoch_time))
+        save_checkpoint(model, self.checkpoint_path, self.finished_epochs, self.schedule)
+
+
+def build_fasttext_model(vector_size, window, min_count, workers):
+    # gensim 4 renamed size to vector_size
+    try:
+        return FastText(vector_size=vector_size, window=window, min_count=min_count, workers=workers)
+    except TypeError:
+        return FastText(size=vector_size, window=window, min_count=min_count, workers=workers)
+
+
+def train_fasttext(corpus_paths, model_path, checkpoint_path, vector_size=100, window=3, min_count=1, epochs=10,
+                   workers=None):
+    """
+    Train the fastText word vectors on the streamed corpus. A checkpoint is saved after the vocabulary is built and
+    after each epoch, and the training resumes from the latest checkpoint if it is interrupted
+    :param corpus_paths: a corpus path or a list of corpus paths(one cleaned tweet per line)
+    :param model_path: the path used to save the trained model
+    :param checkpoint_path: the directory which saves the checkpoints
+    :param vector_size: the dimension of the word vectors
+    :param window: the maximum distance between the current and the predicted word
+    :param min_count: the words with a lower total frequency are ignored
+    :param epochs: the total number of epochs. A resumed run keeps the total epochs saved with its checkpoints
+    :param workers: the number of worker threads. If None, use the number of cores
+    :return: the trained FastText model
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    sentences = CorpusSentences(corpus_paths)
+    state = load_checkpoint_state(checkpoint_path)
+    if state is None:
+        print('Building the vocabulary...')
+        fasttext_model = build_fasttext_model(vector_size, window, min_count, workers)
+        fasttext_model.build_vocab(sentences)
+        finished_epochs = 0
+        # train() overwrites the alpha of the model, so the schedule of the whole run is saved with the checkpoints
+        schedule = {'alpha': fasttext_model.alpha, 'min_alpha': fasttext_model.min_alpha, 'epochs': epochs}
+        save_checkpoint(fasttext_model, checkpoint_path, finished_epochs, schedule)
+    else:
+        finished_epochs = state['finished_epochs']
+        schedule = state['schedule']
+        print('Resuming from the checkpoint after {} of {} epochs...'.format(finished_epochs, schedule['epochs']))
+        fasttext_model = FastText.load(os.path.join(checkpoint_path, state['model_filename']))
+        fasttext_model.workers = workers
+    print('The corpus has {} sentences and {} words'.format(fasttext_model.corpus_count,
+                                                             fasttext_model.corpus_total_words))
+
+    # The resumed run keeps the total epochs of the checkpoints
+    epochs = schedule['epochs']
+    if finished_epochs < epochs:
+        # The learning rate continues to decay linearly from where the interrupted run stopped
+        start_alpha = schedule['alpha'] - (schedule['alpha'] - schedule['min_alpha']) * finished_epochs / epochs
+        start_time = time.time()
+        fasttext_model.train(sentences, total_examples=fasttext_model.corpus_count,
+                             total_words=fasttext_model.corpus_total_words, epochs=epochs - finished_epochs,
+                             start_alpha=start_alpha, end_alpha=schedule['min_alpha'],
+                             callbacks=[EpochLogger(checkpoint_path, finished_epochs, schedule)])
+        print('FastText trained for {} epochs in {:.1f} seconds.'.format(epochs - finished_epochs,
+                                                                         time.time() - start_time))
+    # The callbacks are not saved with the final model
+    fasttext_model.callbacks = ()
+    fasttext_model.save(model_path)
+    return fasttext_model
+
+
+if __name__ == '__main__':
+    # The corpus file is written by clean_sentiment140.py, one cleaned tweet per line
+    print('Generating FastText Vectors ..')
+    train_fasttext(read_data.sentiment140_corpus, os.path.join(read_data.word_vector_path, 'fasttext_model'),
+                   checkpoint_path=os.path.join(read_data.word_vector_path, 'fasttext_checkpoints'),
+                   vector_size=100, window=3, min_count=1, epochs=10)
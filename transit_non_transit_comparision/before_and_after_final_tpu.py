@@ -3,28 +3,28 @@ import numpy as np
 import os
 import pytz
 import csv
-from scipy.stats import linregress
 from datetime import datetime
 import time
 from collections import Counter
 import warnings
 warnings.filterwarnings(action='ignore', category=UserWarning, module='gensim')
 
-from nltk.tokenize import word_tokenize
-from wordcloud import WordCloud
-import gensim
-
 import read_data
 import utils
-import wordcloud_generate
-import Topic_Modelling_for_tweets
+import tweet_token_store
+
+# scipy, nltk, gensim, wordcloud and the plotting packages are imported in the functions which need them, so the
+# aggregation functions of this module(sentiment_by_month, select_dataframe_for_treatment_control, ...) could be
+# imported by the other analyses without loading them
+
+
+def import_pyplot():
+    # Import pyplot and set the mathtext style used in the plots of this module
+    from matplotlib import pyplot as plt
+    from matplotlib import rc
+    rc('mathtext', default='regular')
+    return plt
 
-from matplotlib import pyplot as plt
-import matplotlib.font_manager as font_manageer
-import matplotlib.ticker as mtick
-from matplotlib import rc
-rc('mathtext', default='regular')
-import seaborn as sns
 
 months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 time_list = ['2016_5', '2016_6','2016_7', '2016_8', '2016_9', '2016_10', '2016_11', '2016_12', '2017_1',
@@ -83,6 +83,7 @@ class TransitNeighborhood_Before_After(object):
         return result_dataframe_tn, result_dataframe_tn_not_considered, result_dataframe_non_tn
 
     def compute_abs_coeff_difference(self):
+        from scipy.stats import linregress
         # Compute the coefficient difference of sentiment against time before the treatment
         treatment_group_dataframe, _, control_group_dataframe = self.output_sent_act_dataframe()
         tn_dataframe_with_sentiment_activity = treatment_group_dataframe.set_index('Date')
@@ -139,6 +140,9 @@ class TransitNeighborhood_Before_After(object):
         :param draw_sentiment: if True we draw sentiment comparison plot; Otherwise we draw activity comparison plot
         :return: the sentiment/activity comparison plot
         """
+        import matplotlib.font_manager as font_manageer
+        import matplotlib.ticker as mtick
+        plt = import_pyplot()
         tn_dataframe_sent_act, tn_not_considered_dataframe_sent_act, non_tn_dataframe_sent_act = self.output_sent_act_dataframe()
         # Set Date as the index and reorder rows based on time list
         tn_dataframe_with_sentiment_activity = tn_dataframe_sent_act.set_index('Date')
@@ -309,32 +313,21 @@ class TransitNeighborhood_Before_After(object):
         This function is used to draw the tweet posting time comparison plot
         :param saving_path: the path being used to save the comparison plot
         """
-        treatment_dataframe_copy = self.tn_dataframe.copy()
-        treatment_not_considered_dataframe_copy = self.treatment_not_considered_dataframe.copy()
-        control_dataframe_copy = self.non_tn_dataframe.copy()
-        # Transform the string time to datetime object(just a check)
-        if isinstance(list(treatment_dataframe_copy['hk_time'])[0], str) or isinstance(
-                list(treatment_not_considered_dataframe_copy['hk_time'])[0], str) or isinstance(
-                list(control_dataframe_copy['hk_time'])[0], str):
-            treatment_dataframe_copy['hk_time'] = treatment_dataframe_copy.apply(
-                lambda row: TransitNeighborhood_Before_After.transform_string_time_to_datetime(row['hk_time']), axis=1)
-            treatment_not_considered_dataframe_copy['hk_time'] = treatment_not_considered_dataframe_copy.apply(
-                lambda row: TransitNeighborhood_Before_After.transform_string_time_to_datetime(row['hk_time']), axis=1)
-            control_dataframe_copy['hk_time'] = control_dataframe_copy.apply(
-                lambda row: TransitNeighborhood_Before_After.transform_string_time_to_datetime(row['hk_time']), axis=1)
-        else:
-            pass
+        import seaborn as sns
+        plt = import_pyplot()
+        # Transform the string time to datetime object(just a check). The converted hk_time columns are kept by
+        # the dataframes of this object
+        treatment_dataframe_copy = utils.normalize_hk_time(self.tn_dataframe).copy()
+        treatment_not_considered_dataframe_copy = utils.normalize_hk_time(
+            self.treatment_not_considered_dataframe).copy()
+        control_dataframe_copy = utils.normalize_hk_time(self.non_tn_dataframe).copy()
         # Get the day column and hour column
-        treatment_dataframe_copy['day'] = treatment_dataframe_copy.apply(lambda row: row['hk_time'].day, axis=1)
-        treatment_dataframe_copy['hour'] = treatment_dataframe_copy.apply(lambda row: row['hk_time'].hour, axis=1)
-        treatment_not_considered_dataframe_copy['day'] = treatment_not_considered_dataframe_copy.apply(
-            lambda row: row['hk_time'].day, axis=1)
-        treatment_not_considered_dataframe_copy['hour'] = treatment_not_considered_dataframe_copy.apply(
-            lambda row: row['hk_time'].hour, axis=1)
-        control_dataframe_copy['day'] = control_dataframe_copy.apply(
-            lambda row: row['hk_time'].day, axis=1)
-        control_dataframe_copy['hour'] = control_dataframe_copy.apply(
-            lambda row: row['hk_time'].hour, axis=1)
+        treatment_dataframe_copy['day'] = treatment_dataframe_copy['hk_time'].dt.day
+        treatment_dataframe_copy['hour'] = treatment_dataframe_copy['hk_time'].dt.hour
+        treatment_not_considered_dataframe_copy['day'] = treatment_not_considered_dataframe_copy['hk_time'].dt.day
+        treatment_not_considered_dataframe_copy['hour'] = treatment_not_considered_dataframe_copy['hk_time'].dt.hour
+        control_dataframe_copy['day'] = control_dataframe_copy['hk_time'].dt.day
+        control_dataframe_copy['hour'] = control_dataframe_copy['hk_time'].dt.hour
 
         if self.oct_open:
             treatment_dataframe_before = treatment_dataframe_copy.loc[
@@ -434,16 +427,11 @@ class TransitNeighborhood_Before_After(object):
 
     @staticmethod
     def find_residents_of_tpu(total_dataframe, tpu_list):
-        if isinstance(list(total_dataframe['hk_time'])[0], str):
-            dataframe_copy = total_dataframe.copy()
-            dataframe_copy['hk_time'] = dataframe_copy.apply(
-                lambda row: TransitNeighborhood_Before_After.transform_string_time_to_datetime(row['hk_time']), axis=1)
-        else:
-            dataframe_copy = total_dataframe.copy()
+        dataframe_copy = utils.normalize_hk_time(total_dataframe).copy()
 
         # get the hour and minute columns
-        dataframe_copy['hour'] = dataframe_copy.apply(lambda row: row['hk_time'].hour, axis=1)
-        dataframe_copy['minutes'] = dataframe_copy.apply(lambda row: row['hk_time'].minute, axis=1)
+        dataframe_copy['hour'] = dataframe_copy['hk_time'].dt.hour
+        dataframe_copy['minutes'] = dataframe_copy['hk_time'].dt.minute
 
         # Select tweets which are posted between 12am and 6am
         dataframe_copy_selected = dataframe_copy.loc[(dataframe_copy['hour'] >= 0) & (dataframe_copy['hour'] < 6)]
@@ -463,18 +451,6 @@ class TransitNeighborhood_Before_After(object):
         return tpu_resident_list
 
 
-    @staticmethod
-    # Transform the string time to the datetime object
-    def transform_string_time_to_datetime(string):
-        """
-        :param string: the string which records the time of the posted tweets(this string's timezone is HK time)
-        :return: a datetime object which could get access to the year, month, day easily
-        """
-        datetime_object = datetime.strptime(string, '%Y-%m-%d %H:%M:%S+08:00')
-        final_time_object = datetime_object.replace(tzinfo=time_zone_hk)
-        return final_time_object
-
-
 # compute the percentage of positive Tweets: 2 is positive
 def positive_percent(df):
     positive = 0
@@ -507,22 +483,13 @@ def pos_percent_minus_neg_percent(df):
 
 # compute the sentiment level for each month
 def sentiment_by_month(df, compute_positive_percent=False, compute_negative_percent=False):
-    # check whether the value in the hk_time attribute is string or not
-    if isinstance(list(df['hk_time'])[0], str):
-        df['hk_time'] = df.apply(
-            lambda row: TransitNeighborhood_Before_After.transform_string_time_to_datetime(row['hk_time']), axis=1)
-    else:
-        pass
-    # Check whether one dataframe has the year and the month columns. If not, generate them!
-    try:
-        df['month_plus_year'] = df.apply(lambda row: str(int(float(row['year'])))+'_'+str(int(float(row['month']))),
-                                         axis=1)
-    except KeyError:
-        df['month_plus_year'] = df.apply(lambda row: str(row['hk_time'].year) + '_' + str(row['hk_time'].month),
-                                         axis=1)
+    # Transform the hk_time strings to datetime objects if needed(only once for each dataframe)
+    utils.normalize_hk_time(df)
+    # Reuse the month_plus_year column if the dataframe has it. If not, generate it from year and month or hk_time
+    df['month_plus_year'] = utils.get_month_plus_year(df)
     dataframe_dict = {}
     # Iterate over the pandas dataframe based on the month_plus_year column
-    for time, dataframe_by_time in df.groupby('month_plus_year'):
+    for time, dataframe_by_time in df.groupby('month_plus_year', observed=True):
         dataframe_dict[time] = dataframe_by_time
     # time_list = list(dataframe_dict.keys())
     tweet_month_sentiment = {}
@@ -546,26 +513,17 @@ def build_text_for_wordcloud_topic_model(df, oct_open=True, build_wordcloud=True
     :param build_wordcloud: whether for drawing wordcloud or for topic modelling
     :return: text or dataframes which would be used to generate word cloud or build topic model
     """
+    import wordcloud_generate
     if oct_open:
         open_date_start = october_1_start
         open_date_end = october_31_end
-        df_copy = df.copy()
-        if isinstance(list(df_copy['hk_time'])[0], str):
-            df_copy['hk_time'] = df_copy.apply(
-                lambda row: TransitNeighborhood_Before_After.transform_string_time_to_datetime(row['hk_time']), axis=1)
-        else:
-            pass
+        df_copy = utils.normalize_hk_time(df).copy()
         df_before = df_copy.loc[df_copy['hk_time'] < open_date_start]
         df_after = df_copy.loc[df_copy['hk_time'] > open_date_end]
     else:
         open_date_start = december_1_start
         open_date_end = december_31_end
-        df_copy = df.copy()
-        if isinstance(list(df_copy['hk_time'])[0], str):
-            df_copy['hk_time'] = df_copy.apply(
-                lambda row: TransitNeighborhood_Before_After.transform_string_time_to_datetime(row['hk_time']), axis=1)
-        else:
-            pass
+        df_copy = utils.normalize_hk_time(df).copy()
         df_before = df_copy.loc[df_copy['hk_time'] < open_date_start]
         df_after = df_copy.loc[df_copy['hk_time'] > open_date_end]
     if build_wordcloud: # return a string, for wordcloud creation
@@ -589,6 +547,9 @@ def generate_wordcloud(words_before, words_after, mask, file_name_before, file_n
     :param color_func: color function
     :param figure_saving_path: the saving path of the created figures
     """
+    from wordcloud import WordCloud
+    import wordcloud_generate
+    plt = import_pyplot()
     # stopwords argument in word_cloud: specify the words we neglect when outputing the wordcloud
     word_cloud_before = WordCloud(width = 520, height = 520, background_color='white',
                            font_path=wordcloud_generate.symbola_font_path,
@@ -610,13 +571,18 @@ def generate_wordcloud(words_before, words_after, mask, file_name_before, file_n
     # plt.show()
 
 
-def draw_word_count_histogram(df, station_name, saved_file_name):
+def draw_word_count_histogram(df, station_name, saved_file_name, token_store=None):
     """
     :param df: the dataframe which contains the cleaned posted tweets
     :param saved_file_name: the saved picture file name
+    :param token_store: the word token store(tweet_token_store.load_token_store('word')). The tweets in it are not
+    tokenized again
     """
-    text_list = list(df['cleaned_text'])
-    tokenized_text_list = [word_tokenize(text) for text in text_list]
+    import gensim
+    import seaborn as sns
+    import Topic_Modelling_for_tweets
+    plt = import_pyplot()
+    tokenized_text_list = tweet_token_store.get_token_lists(df, token_store, tokenizer_name='word')
     bigram_phrases = gensim.models.phrases.Phrases(tokenized_text_list, min_count=2, threshold=10)
 
     bigram_mod = gensim.models.phrases.Phraser(bigram_phrases)
@@ -652,16 +618,19 @@ def draw_word_count_histogram(df, station_name, saved_file_name):
 topic_modelling_search_params = {'n_components': [5, 6, 7, 8, 9, 10]}
 
 
-def build_topic_model(df, keyword_file_name, topic_number, topic_predict_file_name, saving_path):
+def build_topic_model(df, keyword_file_name, topic_number, topic_predict_file_name, saving_path, token_store=None):
     """
     :param df: the dataframe which contains the posted tweets
     :param keyword_file_name: the name of the saved file which contains the keyword for each topic
     :param topic_number: the number of topics we set for the topic modelling
     :param topic_predict_file_name: the name of the saved file which contains the topic prediction for each tweet
     :param saving_path: the saving path
+    :param token_store: the word token store(tweet_token_store.load_token_store('word')). The tweets in it are not
+    tokenized again
     """
-    text_list = list(df['cleaned_text'])
-    tokenized_text_list = [word_tokenize(text) for text in text_list]
+    import gensim
+    import Topic_Modelling_for_tweets
+    tokenized_text_list = tweet_token_store.get_token_lists(df, token_store, tokenizer_name='word')
     bigram_phrases = gensim.models.phrases.Phrases(tokenized_text_list, min_count=5, threshold=100)
     bigram_mod = gensim.models.phrases.Phraser(bigram_phrases)
     trigram_phrases = gensim.models.phrases.Phrases(bigram_mod[tokenized_text_list])
@@ -711,24 +680,21 @@ def select_dataframe_for_treatment_control(treatment_set, control_set, treatment
     for tpu_name in treatment_set:
         dataframe_treatment = pd.read_csv(os.path.join(datapath, tpu_name, tpu_name+'_data.csv'), encoding='utf-8',
                                 quoting=csv.QUOTE_NONNUMERIC, dtype='str', index_col=0)
-        dataframe_treatment['month_plus_year'] = dataframe_treatment.apply(
-            lambda row: str(int(float(row['year'])))+'_'+str(int(float(row['month']))), axis=1)
         treatment_dataframe_list.append(dataframe_treatment)
     for tpu_name in control_set:
         dataframe_control = pd.read_csv(os.path.join(datapath, tpu_name, tpu_name+'_data.csv'), encoding='utf-8',
                                         quoting=csv.QUOTE_NONNUMERIC, dtype='str')
-        dataframe_control['month_plus_year'] = dataframe_control.apply(
-            lambda row: str(int(float(row['year'])))+'_'+str(int(float(row['month']))), axis=1)
         control_dataframe_list.append(dataframe_control)
     for tpu_name in treatment_not_considered_set:
         dataframe_control = pd.read_csv(os.path.join(datapath, tpu_name, tpu_name+'_data.csv'), encoding='utf-8',
                                         quoting=csv.QUOTE_NONNUMERIC, dtype='str')
-        dataframe_control['month_plus_year'] = dataframe_control.apply(
-            lambda row: str(int(float(row['year'])))+'_'+str(int(float(row['month']))), axis=1)
         treatment_dataframe_not_considered_list.append(dataframe_control)
     combined_treatment = pd.concat(treatment_dataframe_list, axis=0)
     combined_control = pd.concat(control_dataframe_list, axis=0)
     combined_not_considered_treatment = pd.concat(treatment_dataframe_not_considered_list, axis=0)
+    # Compute the month_plus_year column once for each combined dataframe rather than for each TPU
+    for combined_dataframe in [combined_treatment, combined_control, combined_not_considered_treatment]:
+        combined_dataframe['month_plus_year'] = utils.get_month_plus_year(combined_dataframe)
     print(
         'The size of the treatment group {}; The size of the not considered treatment group {}; '
         'The size of the control group {}'.format(
@@ -760,18 +726,19 @@ def sort_data_based_on_date(df):
 
 
 if __name__ == '__main__':
+    import wordcloud_generate
 
     starting_time = time.time()
 
     # For instance, if we want to compare the sentiment and activity level before and after the
     # opening date of the Whampoa MTR railway station in Hong Kong, since the station is opened on 23 Oct 2016,
     # we could specify the openning date using datatime package and output before and after dataframes
-    october_1_start = datetime(2016, 10, 1, 0, 0, 0, tzinfo=time_zone_hk)
-    october_31_end = datetime(2016, 10, 31, 23, 59, 59, tzinfo=time_zone_hk)
-    december_1_start = datetime(2016, 12, 1, 0, 0, 0, tzinfo=time_zone_hk)
-    december_31_end = datetime(2016, 12, 31, 23, 59, 59, tzinfo=time_zone_hk)
-    start_date = datetime(2016, 5, 7, 0, 0, 0, tzinfo=time_zone_hk)
-    end_date = datetime(2018, 12, 18,  23, 59, 59, tzinfo=time_zone_hk)
+    october_1_start = time_zone_hk.localize(datetime(2016, 10, 1, 0, 0, 0))
+    october_31_end = time_zone_hk.localize(datetime(2016, 10, 31, 23, 59, 59))
+    december_1_start = time_zone_hk.localize(datetime(2016, 12, 1, 0, 0, 0))
+    december_31_end = time_zone_hk.localize(datetime(2016, 12, 31, 23, 59, 59))
+    start_date = time_zone_hk.localize(datetime(2016, 5, 7, 0, 0, 0))
+    end_date = time_zone_hk.localize(datetime(2018, 12, 18, 23, 59, 59))
 
     # List the TPUs in the treatment group and control
     kwun_tong_line_treatment_selected = {'213', '236', '243', '245'}
@@ -879,15 +846,18 @@ if __name__ == '__main__':
                                                return_dataframe=True
                                                )
 
-    # Draw the word count
+    # Draw the word count. The tokens are read from the word token store built by tweet_token_store.py
+    word_token_store = tweet_token_store.load_token_store('word')
     draw_word_count_histogram(df=kwun_tong_line_treatment_dataframe, station_name='Kwun_Tong_Line',
-                              saved_file_name='Kwun_Tong_Line_tweet_word_count.png')
+                              saved_file_name='Kwun_Tong_Line_tweet_word_count.png', token_store=word_token_store)
     draw_word_count_histogram(df=south_horizons_lei_tung_treatment_dataframe,
                               station_name='south_horizons_lei_tung',
-                              saved_file_name='South_horizons_lei_tung_line_tweet_word_count.png')
+                              saved_file_name='South_horizons_lei_tung_line_tweet_word_count.png',
+                              token_store=word_token_store)
     draw_word_count_histogram(df=ocean_park_wong_chuk_hang_treatment_dataframe,
                               station_name='Ocean_park_wong_chuk_hang',
-                              saved_file_name='Ocean_park_wong_chuk_hang_tweet_word_count.png')
+                              saved_file_name='Ocean_park_wong_chuk_hang_tweet_word_count.png',
+                              token_store=word_token_store)
 
     kwun_tong_line_extension_1000_control = TransitNeighborhood_Before_After(name = 'Kwun_Tong_Line',
         tn_dataframe=kwun_tong_line_treatment_dataframe,
@@ -1186,7 +1156,7 @@ if __name__ == '__main__':
             build_topic_model(df=dataframe, keyword_file_name=file_name + '_' + str(topic_number) + '_' + '_keyword.pkl',
                               topic_predict_file_name=file_name + '_' + str(topic_number) + '_' + '_tweet_topic.pkl',
                               saving_path=read_data.before_and_after_topic_modelling_compare,
-                              topic_number=topic_number)
+                              topic_number=topic_number, token_store=word_token_store)
         print('------------------' + file_name + ' ends-----------------------------')
 
     ending_time = time.time()
@@ -10,6 +10,7 @@ import csv
 import before_and_after_final_tpu
 import read_data
 import utils
+import tweet_store
 import wordcloud_generate
 
 # packages for regression
@@ -33,19 +34,12 @@ time_list = ['2016_7', '2016_8', '2016_9', '2016_10', '2016_11', '2016_12', '201
 time_zone_hk = pytz.timezone('Asia/Shanghai')
 # Data path which stores the tweet data for each TPU
 data_path = os.path.join(read_data.tweet_combined_path, 'cross_sectional_tpus')
-# Load a csv file which saves the names of TPUs
-tpu_dataframe = pd.read_csv(os.path.join(read_data.transit_non_transit_comparison_cross_sectional,
-                                         'cross_sectional_independent_variables',
-                                         'tpu_names.csv'), encoding='utf-8')
 
 
 class TransitNeighborhood_TPU(object):
 
-    # Get the TPU name list
-    tpu_name_list = list(tpu_dataframe['TPU Names'])
-    # Get the TN tpus and non-TN TPUs
-    tn_tpus = np.load(os.path.join(read_data.transit_non_transit_comparison, 'tn_tpus.npy'))
-    non_tn_tpus = np.load(os.path.join(read_data.transit_non_transit_comparison, 'non_tn_tpus.npy'))
+    # The TPU name list, the TN TPUs and the non-TN TPUs are loaded by read_data.load_tpu_names,
+    # read_data.load_tn_tpus and read_data.load_non_tn_tpus when they are first needed
 
     def __init__(self, tpu_dataframe, oct_open: bool, before_and_after: bool, compute_positive: bool,
                  compute_negative: bool):
@@ -130,7 +124,7 @@ class TransitNeighborhood_TPU(object):
     @staticmethod
     def select_tpu_for_following_analysis(check_all_stations=False):
         tpu_activity_dict = {}
-        for name in TransitNeighborhood_TPU.tpu_name_list:
+        for name in read_data.load_tpu_names():
             dataframe = pd.read_csv(os.path.join(data_path, name, name + '_data.csv'),
                                     encoding='utf-8', dtype='str', quoting=csv.QUOTE_NONNUMERIC)
             tpu_activity_dict[name] = dataframe.shape[0]
@@ -156,14 +150,14 @@ class TransitNeighborhood_TPU(object):
         """
         assert year_number in [2017, 2018]
         tpu_activity_dict_for_one_year = {}
-        for name in TransitNeighborhood_TPU.tpu_name_list:
+        for name in read_data.load_tpu_names():
             dataframe = pd.read_csv(os.path.join(data_path, name, name + '_data.csv'),
                                     encoding='utf-8', dtype='str', quoting=csv.QUOTE_NONNUMERIC)
             dataframe_copy = dataframe.copy()
             if year_number == 2017:
-                year_dataframe = dataframe_copy.loc[dataframe_copy['year'].isin(['2017.0'])]
+                year_dataframe = dataframe_copy.loc[pd.to_numeric(dataframe_copy['year']) == 2017]
             else:
-                year_dataframe = dataframe_copy.loc[dataframe_copy['year'].isin(['2018.0'])]
+                year_dataframe = dataframe_copy.loc[pd.to_numeric(dataframe_copy['year']) == 2018]
             # Here, we don't consider tpus in which the number of posted tweets is less than 100 in one year
             if year_dataframe.shape[0] >= 100:
                 tpu_activity_dict_for_one_year[name] = year_dataframe.shape[0]
@@ -180,12 +174,11 @@ class TransitNeighborhood_TPU(object):
         """
         assert quarter_number in [1, 2, 3, 4, 5, 6, 7, 8]
         tpu_activity_dict_for_one_quarter = {}
-        for name in TransitNeighborhood_TPU.tpu_name_list:
+        for name in read_data.load_tpu_names():
             dataframe = pd.read_csv(os.path.join(data_path, name, name + '_data.csv'),
                                     encoding='utf-8', dtype='str', quoting=csv.QUOTE_NONNUMERIC)
             dataframe_copy = dataframe.copy()
-            dataframe_copy['month_plus_year'] = dataframe_copy.apply(
-                lambda row: str(int(float(row['year']))) + '_' + str(int(float(row['month'][:-2]))), axis=1)
+            dataframe_copy['month_plus_year'] = utils.get_month_plus_year(dataframe_copy)
             if quarter_number == 1:
                 month_plus_year_list = ['2017_1', '2017_2', '2017_3']
             elif quarter_number == 2:
@@ -230,9 +223,9 @@ class TransitNeighborhood_TPU(object):
 
     @staticmethod
     def check_tn_tpu_or_nontn_tpu(tpu_name):
-        if tpu_name in TransitNeighborhood_TPU.tn_tpus:
+        if tpu_name in read_data.load_tn_tpus():
             result = 'tn_tpu'
-        elif tpu_name in TransitNeighborhood_TPU.non_tn_tpus:
+        elif tpu_name in read_data.load_non_tn_tpus():
             result = 'non_tn_tpu'
         else:
             result = 'not considered'
@@ -512,17 +505,17 @@ def draw_boxplot(dataframe, column_name, title_name):
 def build_data_for_cross_sectional_study(tweet_data_path, saving_path, only_2017_2018=True):
     """
     construct tweet dataframe for each TPU unit
-    :param tweet_data_path: path which is used to save all the filtered tweets
+    :param tweet_data_path: path of the tweet store which saves all the filtered tweets
     :param saving_path: path which is used to save the tweets posted in each TPU
     :return:
     """
-    all_tweet_data = pd.read_csv(os.path.join(tweet_data_path, 'tweet_combined_sentiment_without_bots.csv'),
-                                 encoding='utf-8', quoting=csv.QUOTE_NONNUMERIC)
     if only_2017_2018: # Only consider the tweets posted in 2017 and 2018
-        assert 2017.0 in list(all_tweet_data['year'])
-        assert 2018.0 in list(all_tweet_data['year'])
-        tweet_2017_2018 = all_tweet_data.loc[all_tweet_data['year'].isin([2017.0, 2018.0])]
-        tpu_set = set(tpu_dataframe['TPU Names'])
+        # Only the year=2017 and year=2018 partitions of the tweet store are loaded
+        tweet_2017_2018 = tweet_store.read_tweet_store(table_name='tweet_combined_sentiment_without_bots',
+                                                       years=[2017, 2018], store_path=tweet_data_path)
+        assert 2017 in set(tweet_2017_2018['year'])
+        assert 2018 in set(tweet_2017_2018['year'])
+        tpu_set = set(read_data.load_tpu_names())
         for tpu in tpu_set:
             try:
                 os.mkdir(os.path.join(saving_path, tpu))
@@ -533,7 +526,9 @@ def build_data_for_cross_sectional_study(tweet_data_path, saving_path, only_2017
             dataframe.to_csv(os.path.join(saving_path, tpu, tpu+'_data.csv'), encoding='utf-8',
                              quoting=csv.QUOTE_NONNUMERIC)
     else:
-        tpu_set = set(tpu_dataframe['TPU Names'])
+        all_tweet_data = tweet_store.read_tweet_store(table_name='tweet_combined_sentiment_without_bots',
+                                                      store_path=tweet_data_path)
+        tpu_set = set(read_data.load_tpu_names())
         for tpu in tpu_set:
             try:
                 os.mkdir(os.path.join(saving_path, tpu))
@@ -655,10 +650,10 @@ def regres_analysis(sent_act_dataframe, social_demographic_merged_filenanme):
 
 if __name__ == '__main__':
     # Specify some important dates
-    october_23_start = datetime(2016, 10, 23, 0, 0, 0, tzinfo=time_zone_hk)
-    october_23_end = datetime(2016, 10, 23, 23, 59, 59, tzinfo=time_zone_hk)
-    december_28_start = datetime(2016, 12, 28, 0, 0, 0, tzinfo=time_zone_hk)
-    december_28_end = datetime(2016, 12, 28, 23, 59, 59, tzinfo=time_zone_hk)
+    october_23_start = time_zone_hk.localize(datetime(2016, 10, 23, 0, 0, 0))
+    october_23_end = time_zone_hk.localize(datetime(2016, 10, 23, 23, 59, 59))
+    december_28_start = time_zone_hk.localize(datetime(2016, 12, 28, 0, 0, 0))
+    december_28_end = time_zone_hk.localize(datetime(2016, 12, 28, 23, 59, 59))
 
     # Build the dataframe for the social demographic variables for each TPU
     demographic_path = os.path.join(read_data.transit_non_transit_comparison_cross_sectional,
@@ -685,7 +680,7 @@ if __name__ == '__main__':
 
     print('-----------------------Deal with the tweet 2017 & tweet 2018 together--------------------------')
     # Find the tweets in each TPU and save them to a local directory
-    build_data_for_cross_sectional_study(tweet_data_path=read_data.tweet_combined_path,
+    build_data_for_cross_sectional_study(tweet_data_path=read_data.tweet_store_path,
                                          saving_path=os.path.join(read_data.tweet_combined_path,
                                                                   'cross_sectional_tpus'))
     # We have built folder for each TPU to store tweets
@@ -754,9 +749,9 @@ if __name__ == '__main__':
                 os.path.join(data_path, tpu, tpu + '_data.csv'), encoding='utf-8', dtype='str',
                 quoting=csv.QUOTE_NONNUMERIC)
             if index_value == 0:
-                year_dataframe = dataframe.loc[dataframe['year'].isin(['2017.0'])]
+                year_dataframe = dataframe.loc[pd.to_numeric(dataframe['year']) == 2017]
             else:
-                year_dataframe = dataframe.loc[dataframe['year'].isin(['2018.0'])]
+                year_dataframe = dataframe.loc[pd.to_numeric(dataframe['year']) == 2018]
             sentiment_dict[tpu] = pos_percent_minus_neg_percent(year_dataframe)
 
     whole_sent_act_year_2017 = TransitNeighborhood_TPU.construct_sent_act_dataframe(sent_dict=sentiment_dict_2017,
@@ -24,49 +24,33 @@ rc('mathtext', default='regular')
 # Hong Kong and Shanghai share the same time zone.
 # Hence, we transform the utc time in our dataset into Shanghai time
 time_zone_hk = pytz.timezone('Asia/Shanghai')
-october_1_start = datetime(2016, 10, 1, 0, 0, 0, tzinfo=time_zone_hk)
-october_31_end = datetime(2016, 10, 31, 23, 59, 59, tzinfo=time_zone_hk)
-december_1_start = datetime(2016, 12, 1, 0, 0, 0, tzinfo=time_zone_hk)
-december_31_end = datetime(2016, 12, 31, 23, 59, 59, tzinfo=time_zone_hk)
+october_1_start = time_zone_hk.localize(datetime(2016, 10, 1, 0, 0, 0))
+october_31_end = time_zone_hk.localize(datetime(2016, 10, 31, 23, 59, 59))
+december_1_start = time_zone_hk.localize(datetime(2016, 12, 1, 0, 0, 0))
+december_31_end = time_zone_hk.localize(datetime(2016, 12, 31, 23, 59, 59))
 
 
-def transform_string_time_to_datetime(string):
-    """
-    :param string: the string which records the time of the posted tweets
-    :return: a datetime object which could get access to the year, month, day easily
-    """
-    assert isinstance(string, str)
-    datetime_object = datetime.strptime(string, '%Y-%m-%d %H:%M:%S+08:00')
-    final_time_object = datetime_object.replace(tzinfo=time_zone_hk)
-    return final_time_object
-
-
-def add_post_variable(string, opening_start_date, opening_end_date, check_window=0):
+def add_post_variable(hk_time, opening_start_date, opening_end_date, check_window=0):
     """
     Add the value of the POST variable in the DID analysis
-    :param string: the time string
+    :param hk_time: the datetime hk_time column of a tweet dataframe(use utils.normalize_hk_time first)
     :param opening_start_date: the opening date of the studied station
     :param opening_end_date: the closing date of the studied station
     :param check_window: the month window size used to check the temporal effect of the studied station
-    :return: the post variable based on the time of one tweet
+    :return: the post variable of each tweet based on its time: 1, 0 or 'not considered'
     """
-    time_object = transform_string_time_to_datetime(string)
     if check_window == 0:
-        if time_object > opening_end_date:
-            return 1
-        elif time_object < opening_start_date:
-            return 0
-        else:
-            return 'not considered'
+        before_mask = hk_time < opening_start_date
+        after_mask = hk_time > opening_end_date
     else:
         left_time_range = opening_start_date - relativedelta(months=check_window)
         right_time_range = opening_end_date + relativedelta(months=check_window)
-        if left_time_range <= time_object < opening_start_date:
-            return 0
-        elif opening_end_date < time_object <= right_time_range:
-            return 1
-        else:
-            return 'not considered'
+        before_mask = (hk_time >= left_time_range) & (hk_time < opening_start_date)
+        after_mask = (hk_time > opening_end_date) & (hk_time <= right_time_range)
+    post_variable = pd.Series('not considered', index=hk_time.index, dtype=object)
+    post_variable[before_mask] = 0
+    post_variable[after_mask] = 1
+    return post_variable
 
 
 def build_regress_datafrane_for_one_newly_built_station(treatment_dataframe, control_dataframe,
@@ -90,16 +74,18 @@ def build_regress_datafrane_for_one_newly_built_station(treatment_dataframe, con
     zeros_list = [0] * control_dataframe.shape[0]
     control_dataframe['T_i_t'] = zeros_list
     # build the post variable
-    treatment_dataframe['Post'] = treatment_dataframe.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=station_open_start_date,
-                                      opening_end_date=station_open_end_date, check_window=check_window_value), axis=1)
+    treatment_dataframe['Post'] = add_post_variable(
+        utils.normalize_hk_time(treatment_dataframe)['hk_time'],
+        opening_start_date=station_open_start_date, opening_end_date=station_open_end_date,
+        check_window=check_window_value)
     print('Check the post variable distribution of treatment group: {}'.format(
         Counter(treatment_dataframe['Post'])))
     print('Check the T_i_t variable distribution of treatment group: {}'.format(
         Counter(treatment_dataframe['T_i_t'])))
-    control_dataframe['Post'] = control_dataframe.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=station_open_start_date,
-                                      opening_end_date=station_open_end_date, check_window=check_window_value), axis=1)
+    control_dataframe['Post'] = add_post_variable(
+        utils.normalize_hk_time(control_dataframe)['hk_time'],
+        opening_start_date=station_open_start_date, opening_end_date=station_open_end_date,
+        check_window=check_window_value)
     print('Check the post variable distribution of control group: {}'.format(
         Counter(control_dataframe['Post'])))
     print('Check the T_i_t variable distribution of control group: {}'.format(
@@ -110,11 +96,10 @@ def build_regress_datafrane_for_one_newly_built_station(treatment_dataframe, con
     combined_dataframe_without_not_considered = \
         combined_dataframe.loc[combined_dataframe['Post'] != 'not considered']
     combined_data_copy = combined_dataframe_without_not_considered.copy()
-    combined_data_copy['month_plus_year'] = combined_data_copy.apply(
-        lambda row: str(int(float(row['year']))) + '_' + str(int(float(row['month']))), axis=1)
+    combined_data_copy['month_plus_year'] = utils.get_month_plus_year(combined_data_copy)
     sentiment_dict = {}
     activity_dict = {}
-    for _, dataframe in combined_data_copy.groupby(['month_plus_year', 'T_i_t', 'Post']):
+    for _, dataframe in combined_data_copy.groupby(['month_plus_year', 'T_i_t', 'Post'], observed=True):
         time = str(list(dataframe['month_plus_year'])[0])
         t_i_t = str(list(dataframe['T_i_t'])[0])
         post = str(list(dataframe['Post'])[0])
@@ -168,24 +153,30 @@ def build_regress_dataframe_for_combined_areas(kwun_tong_treatment, kwun_tong_co
     ocean_park_treatment['T_i_t'] = [1] * ocean_park_treatment.shape[0]
     ocean_park_control['T_i_t'] = [0] * ocean_park_control.shape[0]
     # add the post variable
-    kwun_tong_treatment['Post'] = kwun_tong_treatment.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=october_1_start,
-                                      opening_end_date=october_31_end, check_window=check_window_value), axis=1)
-    kwun_tong_control['Post'] = kwun_tong_control.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=october_1_start,
-                                      opening_end_date=october_31_end, check_window=check_window_value), axis=1)
-    south_horizons_treatment['Post'] = south_horizons_treatment.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=december_1_start,
-                                      opening_end_date=december_31_end, check_window=check_window_value), axis=1)
-    south_horizons_control['Post'] = south_horizons_control.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=december_1_start,
-                                      opening_end_date=december_31_end, check_window=check_window_value), axis=1)
-    ocean_park_treatment['Post'] = ocean_park_treatment.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=december_1_start,
-                                      opening_end_date=december_31_end, check_window=check_window_value), axis=1)
-    ocean_park_control['Post'] = ocean_park_control.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=december_1_start,
-                                      opening_end_date=december_31_end, check_window=check_window_value), axis=1)
+    kwun_tong_treatment['Post'] = add_post_variable(
+        utils.normalize_hk_time(kwun_tong_treatment)['hk_time'],
+        opening_start_date=october_1_start, opening_end_date=october_31_end,
+        check_window=check_window_value)
+    kwun_tong_control['Post'] = add_post_variable(
+        utils.normalize_hk_time(kwun_tong_control)['hk_time'],
+        opening_start_date=october_1_start, opening_end_date=october_31_end,
+        check_window=check_window_value)
+    south_horizons_treatment['Post'] = add_post_variable(
+        utils.normalize_hk_time(south_horizons_treatment)['hk_time'],
+        opening_start_date=december_1_start, opening_end_date=december_31_end,
+        check_window=check_window_value)
+    south_horizons_control['Post'] = add_post_variable(
+        utils.normalize_hk_time(south_horizons_control)['hk_time'],
+        opening_start_date=december_1_start, opening_end_date=december_31_end,
+        check_window=check_window_value)
+    ocean_park_treatment['Post'] = add_post_variable(
+        utils.normalize_hk_time(ocean_park_treatment)['hk_time'],
+        opening_start_date=december_1_start, opening_end_date=december_31_end,
+        check_window=check_window_value)
+    ocean_park_control['Post'] = add_post_variable(
+        utils.normalize_hk_time(ocean_park_control)['hk_time'],
+        opening_start_date=december_1_start, opening_end_date=december_31_end,
+        check_window=check_window_value)
 
     dataframe_list = [kwun_tong_treatment, kwun_tong_control, south_horizons_treatment,
                           south_horizons_control, ocean_park_treatment, ocean_park_control]
@@ -195,8 +186,7 @@ def build_regress_dataframe_for_combined_areas(kwun_tong_treatment, kwun_tong_co
     combined_dataframe_without_not_considered = \
         combined_dataframe.loc[combined_dataframe['Post'] != 'not considered']
     combined_data_copy = combined_dataframe_without_not_considered.copy()
-    combined_data_copy['month_plus_year'] = combined_data_copy.apply(
-        lambda row: str(int(float(row['year']))) + '_' + str(int(float(row['month']))), axis=1)
+    combined_data_copy['month_plus_year'] = utils.get_month_plus_year(combined_data_copy)
 
     result_dataframe_copy = result_dataframe.copy()
     if sentiment_did:
@@ -205,7 +195,7 @@ def build_regress_dataframe_for_combined_areas(kwun_tong_treatment, kwun_tong_co
         post_list = []
         sentiment_list = []
         sentiment_dict = {}
-        for _, dataframe in combined_data_copy.groupby(['month_plus_year', 'T_i_t', 'Post']):
+        for _, dataframe in combined_data_copy.groupby(['month_plus_year', 'T_i_t', 'Post'], observed=True):
             time = str(list(dataframe['month_plus_year'])[0])
             t_i_t = str(list(dataframe['T_i_t'])[0])
             post = str(list(dataframe['Post'])[0])
@@ -230,7 +220,7 @@ def build_regress_dataframe_for_combined_areas(kwun_tong_treatment, kwun_tong_co
         post_list = []
         activity_list = []
         activity_dict = {}
-        for _, dataframe in combined_data_copy.groupby(['month_plus_year', 'T_i_t', 'Post']):
+        for _, dataframe in combined_data_copy.groupby(['month_plus_year', 'T_i_t', 'Post'], observed=True):
             time = str(list(dataframe['month_plus_year'])[0])
             t_i_t = str(list(dataframe['T_i_t'])[0])
             post = str(list(dataframe['Post'])[0])
@@ -273,16 +263,18 @@ def build_regress_dataframe_for_one_newly_built_station(treatment_dataframe, con
     zeros_list = [0] * control_dataframe.shape[0]
     control_dataframe['T_i_t'] = zeros_list
     # build the post variable
-    treatment_dataframe['Post'] = treatment_dataframe.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=station_open_month_start,
-                                      opening_end_date=station_open_month_end, check_window=check_window_value), axis=1)
+    treatment_dataframe['Post'] = add_post_variable(
+        utils.normalize_hk_time(treatment_dataframe)['hk_time'],
+        opening_start_date=station_open_month_start, opening_end_date=station_open_month_end,
+        check_window=check_window_value)
     print('Check the post variable distribution of treatment group: {}'.format(
         Counter(treatment_dataframe['Post'])))
     print('Check the T_i_t variable distribution of treatment group: {}'.format(
         Counter(treatment_dataframe['T_i_t'])))
-    control_dataframe['Post'] = control_dataframe.apply(
-        lambda row: add_post_variable(row['hk_time'], opening_start_date=station_open_month_start,
-                                      opening_end_date=station_open_month_end, check_window=check_window_value), axis=1)
+    control_dataframe['Post'] = add_post_variable(
+        utils.normalize_hk_time(control_dataframe)['hk_time'],
+        opening_start_date=station_open_month_start, opening_end_date=station_open_month_end,
+        check_window=check_window_value)
     print('Check the post variable distribution of control group: {}'.format(
         Counter(control_dataframe['Post'])))
     print('Check the T_i_t variable distribution of control group: {}'.format(
@@ -293,12 +285,11 @@ def build_regress_dataframe_for_one_newly_built_station(treatment_dataframe, con
     combined_dataframe_without_not_considered = \
         combined_dataframe.loc[combined_dataframe['Post'] != 'not considered']
     combined_data_copy = combined_dataframe_without_not_considered.copy()
-    combined_data_copy['month_plus_year'] = combined_data_copy.apply(
-        lambda row: str(int(float(row['year']))) + '_' + str(int(float(row['month']))), axis=1)
+    combined_data_copy['month_plus_year'] = utils.get_month_plus_year(combined_data_copy)
     sentiment_dict = {}
     activity_dict = {}
     activity_dict_log = {}
-    for _, dataframe in combined_data_copy.groupby(['month_plus_year', 'T_i_t', 'Post']):
+    for _, dataframe in combined_data_copy.groupby(['month_plus_year', 'T_i_t', 'Post'], observed=True):
         time = str(list(dataframe['month_plus_year'])[0])
         t_i_t = str(list(dataframe['T_i_t'])[0])
         post = str(list(dataframe['Post'])[0])
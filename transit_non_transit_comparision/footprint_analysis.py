@@ -9,18 +9,18 @@ import pytz
 import matplotlib.pyplot as plt
 
 import read_data
-import utils
+import tweet_store
 
 time_zone_hk = pytz.timezone('Asia/Shanghai')
-july_1_start = datetime(2016, 7, 1, 0, 0, 0, tzinfo=time_zone_hk)
-october_1_start = datetime(2016, 10, 1, 0, 0, 0, tzinfo=time_zone_hk)
-october_31_end = datetime(2016, 10, 31, 23, 59, 59, tzinfo=time_zone_hk)
-jan_31_end = datetime(2017, 1, 31, 23, 59, 59, tzinfo=time_zone_hk)
+july_1_start = time_zone_hk.localize(datetime(2016, 7, 1, 0, 0, 0))
+october_1_start = time_zone_hk.localize(datetime(2016, 10, 1, 0, 0, 0))
+october_31_end = time_zone_hk.localize(datetime(2016, 10, 31, 23, 59, 59))
+jan_31_end = time_zone_hk.localize(datetime(2017, 1, 31, 23, 59, 59))
 
-sep_1_start = datetime(2016, 9, 1, 0, 0, 0, tzinfo=time_zone_hk)
-december_1_start = datetime(2016, 12, 1, 0, 0, 0, tzinfo=time_zone_hk)
-december_31_end = datetime(2016, 12, 31, 23, 59, 59, tzinfo=time_zone_hk)
-mar_31_end = datetime(2017, 3, 31, 23, 59, 59, tzinfo=time_zone_hk)
+sep_1_start = time_zone_hk.localize(datetime(2016, 9, 1, 0, 0, 0))
+december_1_start = time_zone_hk.localize(datetime(2016, 12, 1, 0, 0, 0))
+december_31_end = time_zone_hk.localize(datetime(2016, 12, 31, 23, 59, 59))
+mar_31_end = time_zone_hk.localize(datetime(2017, 3, 31, 23, 59, 59))
 
 
 def get_tweets_before_after(df, studied_area:str, saving_path:str, oct_open=True):
@@ -97,15 +97,12 @@ def get_daytime_footprints(dataframe, studied_area: str, before_or_not=True):
 if __name__ == '__main__':
 
     # Load all the geocoded tweets
-    tweet_2016_2017_2018 = utils.read_local_csv_file(path=read_data.tweet_combined_path,
-                                                     filename='tweets_with_chinese_vader.csv',
-                                                     dtype_str=True)
+    # The hk_time column in the tweet store has already been saved as datetime
+    tweet_2016_2017_2018 = tweet_store.read_tweet_store(table_name='tweets_with_chinese_vader')
     all_geocoded_data = tweet_2016_2017_2018.copy()
-    all_geocoded_data['hk_time'] = all_geocoded_data.apply(
-        lambda row: utils.transform_string_time_to_datetime(row['hk_time']), axis=1)
     # get the hour and minute columns
-    all_geocoded_data['hour'] = all_geocoded_data.apply(lambda row: row['hk_time'].hour, axis=1)
-    all_geocoded_data['minutes'] = all_geocoded_data.apply(lambda row: row['hk_time'].minute, axis=1)
+    all_geocoded_data['hour'] = all_geocoded_data['hk_time'].dt.hour
+    all_geocoded_data['minutes'] = all_geocoded_data['hk_time'].dt.minute
     print(all_geocoded_data.columns)
 
     # Get tweets before & after
@@ -0,0 +1,399 @@
+import os
+import re
+import string
+from codecs import encode
+from collections import Counter, deque
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import pandas as pd
+
+import read_data
+import tweet_cleaning_cache
+
+# ekphrasis is imported in build_text_processor. Hence the worker processes cleaning the Chinese tweets and the
+# modules which only decode the emojis do not load its word statistics
+
+# The version of the cleaning pipeline. Bump it when the output of the cleaning functions changes. The cleaned
+# texts cached by the old versions are then never hit again and are evicted from the cache
+cleaning_pipeline_version = '1'
+
+# The emoji dictionary which maps the R encodings(e.g. <ed><A0><BD><ed><B8><80>) of the emojis to the emojis
+emoji_dictionary_filename = 'emoji.pkl'
+
+
+# This function is used to erase all the 'U+00' pattern in the twitter text
+def remove_u_plus(text):
+    result = re.sub(pattern=r'U\+00', repl=r'', string=text)
+    return result
+
+
+class EmojiDecoder(object):
+
+    def __init__(self, emoji_dictionary):
+        """
+        Decode the R encodings of the emojis in one left to right pass. All the encodings are compiled into one
+        alternation regex, and each match is looked up in a dict, instead of running two re.sub for each row of
+        the emoji dictionary
+        :param emoji_dictionary: the emoji dataframe with the R_Encoding, R_Encoding_lower and emoji columns
+        """
+        self.emoji_list = list(emoji_dictionary['emoji'])
+        self.encoding_dict = {}
+        for encoding, encoding_lower, emoji in zip(emoji_dictionary['R_Encoding'],
+                                                   emoji_dictionary['R_Encoding_lower'], emoji_dictionary['emoji']):
+            # If an encoding appears more than once, the first row wins
+            self.encoding_dict.setdefault(encoding, emoji)
+            self.encoding_dict.setdefault(encoding_lower, emoji)
+        # The longest encodings are tried first. Hence a ZWJ sequence(e.g. family) is decoded to one emoji
+        # rather than the emojis of its components
+        sorted_encodings = sorted(self.encoding_dict, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(encoding) for encoding in sorted_encodings))
+        # The number of times each emoji appears in the emoji list and the length of the longest emoji. They are
+        # used to find the emojis in a token without scanning the whole emoji list
+        self.emoji_counter = Counter(self.emoji_list)
+        self.max_emoji_length = max(len(emoji) for emoji in self.emoji_counter)
+        # One character of each emoji, preferring the non ASCII ones. A token without any of these characters has
+        # no emoji, which skips almost all the tokens since the escaped raw text is ASCII
+        self.emoji_chars = set()
+        for emoji in self.emoji_counter:
+            non_ascii_chars = [character for character in emoji if ord(character) > 127]
+            self.emoji_chars.add(non_ascii_chars[0] if non_ascii_chars else emoji[0])
+
+    def decode(self, text):
+        return self.pattern.sub(lambda match: self.encoding_dict[match.group(0)], text)
+
+    def count_emojis_in_token(self, token):
+        """
+        Count the entries of the emoji list which appear in a token
+        :param token: a string without blanks
+        :return: the number of entries of the emoji list which are substrings of the token
+        """
+        if self.emoji_chars.isdisjoint(token):
+            return 0
+        found_emojis = set()
+        for start in range(len(token)):
+            for end in range(start + 1, min(start + self.max_emoji_length, len(token)) + 1):
+                if token[start:end] in self.emoji_counter:
+                    found_emojis.add(token[start:end])
+        return sum(self.emoji_counter[emoji] for emoji in found_emojis)
+
+
+@lru_cache(maxsize=None)
+def load_emoji_decoder(path=None):
+    """
+    Load the emoji dictionary and build the emoji decoder once per process
+    :param path: the path which saves the emoji.pkl. If None, use read_data.tweet_2017
+    :return: an EmojiDecoder object
+    """
+    if path is None:
+        path = read_data.tweet_2017
+    return EmojiDecoder(pd.read_pickle(os.path.join(path, emoji_dictionary_filename)))
+
+
+def show_emoji_in_tweet(text, emoji_decoder):
+    """
+    Show the emojis in the raw tweet text
+    :param text: the raw tweet text
+    :param emoji_decoder: an EmojiDecoder object. The emoji dataframe is also accepted but the decoder is then
+    built on each call
+    :return: the text in which the R encodings of the emojis are replaced by the emojis
+    """
+    if isinstance(emoji_decoder, pd.DataFrame):
+        emoji_decoder = EmojiDecoder(emoji_decoder)
+    without_u = remove_u_plus(text)
+    old_text = without_u.encode('unicode_escape').decode('utf-8')
+    result1 = re.sub(pattern='\\\\r', repl='', string=old_text)
+    result2 = re.sub(pattern='\\\\n', repl='', string=result1)
+    result3 = re.sub(pattern='\\\\x([a-z0-9]{2})', repl='<\\1>', string=result2)
+    return emoji_decoder.decode(result3)
+
+
+def show_chinese_step1(text, emoji_list):
+    result1 = text.lower().replace('<u+', '\\u')
+    result2 = result1.replace('>', '')
+    all_chars = result2.split()
+    new_all_chars = []
+    for char in all_chars:
+        emoji_in_char = False
+        for emoji in emoji_list:
+            if emoji in char:
+                emoji_in_char = True
+                new_char = char.encode('utf-8').decode('utf-8')
+                new_all_chars.append(new_char)
+            else:
+                pass
+        if not emoji_in_char:
+            new_char = char.encode('utf-8').decode('unicode_escape')
+            new_all_chars.append(new_char)
+    return " ".join(new_all_chars)
+
+
+def show_chinese_step2(text):
+    result1 = text.replace('<', '\\x')
+    result2 = encode(result1.encode().decode('unicode_escape', 'ignore'), 'raw_unicode_escape')
+    result3 = result2.decode('utf-8', 'ignore')
+    return result3
+
+
+def show_chinese_step3(text):
+    patterns = re.findall(pattern='\\\\u[a-z0-9]{4}', string=text)
+    old_text = text
+    for pattern in patterns:
+        new_pattern = pattern.encode('utf-8').decode('unicode_escape', 'ignore')
+        new_text = old_text.replace(pattern, new_pattern)
+        old_text = new_text
+    return old_text
+
+
+# The escaped unicode characters(e.g. \u4e2d) which are left after decoding the bytes
+escaped_unicode_pattern = re.compile('\\\\u[a-z0-9]{4}')
+
+
+def decode_chinese_text(text, emoji_decoder):
+    """
+    Turn the escaped raw Chinese text(<U+XXXX>, <xx> bytes and \\uXXXX) into unicode. It gives the same output
+    as show_chinese_step1, show_chinese_step2 and show_chinese_step3, but each token is checked against the
+    emojis with set lookups and the escaped characters are decoded in one regex pass
+    :param text: the tweet text returned by show_emoji_in_tweet
+    :param emoji_decoder: an EmojiDecoder object
+    :return: the decoded text
+    """
+    decoded_tokens = []
+    for token in text.lower().replace('<u+', '\\u').replace('>', '').split():
+        emoji_number = emoji_decoder.count_emojis_in_token(token)
+        if emoji_number > 0:
+            # Like show_chinese_step1, a token is kept once for each emoji it contains
+            decoded_tokens.extend([token] * emoji_number)
+        else:
+            decoded_tokens.append(token.encode('utf-8').decode('unicode_escape'))
+    escaped_text = ' '.join(decoded_tokens).replace('<', '\\x')
+    decoded_text = encode(escaped_text.encode().decode('unicode_escape', 'ignore'),
+                          'raw_unicode_escape').decode('utf-8', 'ignore')
+    return escaped_unicode_pattern.sub(
+        lambda match: match.group(0).encode('utf-8').decode('unicode_escape', 'ignore'), decoded_text)
+
+
+def build_text_processor():
+    """
+    Build the ekphrasis text processor(officially used in SemEval NLP competition). Loading the word statistics of
+    the twitter segmenter and corrector is slow, hence the processor should be built once in each process
+    :return: an ekphrasis TextPreProcessor object
+    """
+    from ekphrasis.classes.preprocessor import TextPreProcessor
+    from ekphrasis.classes.tokenizer import SocialTokenizer
+    from ekphrasis.dicts.emoticons import emoticons
+    return TextPreProcessor(
+        # terms that will be normalized
+        normalize=['url', 'email', 'percent', 'money', 'phone', 'user',
+                   'time', 'url', 'date', 'number'],
+        # terms that will be annotated
+        annotate={"hashtag", "allcaps", "elongated", "repeated",
+                  'emphasis', 'censored'},
+        fix_html=True,  # fix HTML tokens
+
+        # corpus from which the word statistics are going to be used
+        # for word segmentation
+        segmenter="twitter",
+
+        # corpus from which the word statistics are going to be used
+        # for spell correction
+        corrector="twitter",
+
+        unpack_hashtags=True,  # perform word segmentation on hashtags
+        unpack_contractions=True,  # Unpack contractions (can't -> can not)
+        spell_correct_elong=False,  # spell correction for elongated words
+
+        # select a tokenizer. You can use SocialTokenizer, or pass your own
+        # the tokenizer, should take as input a string and return a list of tokens
+        tokenizer=SocialTokenizer(lowercase=True).tokenize,
+
+        # list of dictionaries, for replacing tokens extracted from the text,
+        # with other expressions. You can pass more than one dictionaries.
+        dicts=[emoticons]
+    )
+
+
+def preprocessing_for_english(text_preprocessor, raw_text):
+    preprocessed_text = ' '.join(text_preprocessor.pre_process_doc(str(raw_text)))
+    # remove punctuations
+    result = re.sub(u'[{}]'.format(string.punctuation), u'', preprocessed_text)
+    return result
+
+
+def clean_english_tweet(text, emoji_decoder, text_processor):
+    text_with_emoji = show_emoji_in_tweet(text, emoji_decoder)
+    return preprocessing_for_english(text_processor, text_with_emoji)
+
+
+def clean_chinese_tweet(text, emoji_decoder):
+    text_with_emoji = show_emoji_in_tweet(text, emoji_decoder)
+    return decode_chinese_text(text_with_emoji, emoji_decoder)
+
+
+# The emoji decoder and the text processor of a cleaning worker process, built once by init_cleaning_worker
+worker_state = {}
+
+
+def init_cleaning_worker(emoji_path=None, build_processor=True):
+    """
+    Build the emoji decoder and the ekphrasis text processor once in a cleaning worker process
+    :param emoji_path: the path which saves the emoji.pkl. If None, use read_data.tweet_2017
+    :param build_processor: whether to build the text processor. Only the English tweets need it
+    """
+    worker_state['emoji_decoder'] = load_emoji_decoder(emoji_path)
+    worker_state['text_processor'] = build_text_processor() if build_processor else None
+
+
+def route_text_chunk(texts, languages):
+    """
+    Dispatch each tweet of a chunk to the English or the Chinese cleaner by its language code
+    :param texts: a list of raw tweet texts
+    :param languages: a list of the language codes of the tweets
+    :return: a list of cleaned texts in the same order. The tweets in other languages get None
+    """
+    emoji_decoder = worker_state['emoji_decoder']
+    text_processor = worker_state['text_processor']
+    cleaned_texts = [None] * len(texts)
+    for position, (text, language) in enumerate(zip(texts, languages)):
+        if language == 'en':
+            cleaned_texts[position] = clean_english_tweet(text, emoji_decoder, text_processor)
+        elif language == 'zh':
+            cleaned_texts[position] = clean_chinese_tweet(text, emoji_decoder)
+    return cleaned_texts
+
+
+def clean_text_chunk(texts, language):
+    """
+    Clean a chunk of tweets in a worker process which has been initialized by init_cleaning_worker
+    :param texts: a list of raw tweet texts
+    :param language: 'en' or 'zh', or a list of the language codes of the tweets. See route_text_chunk
+    :return: a list of cleaned texts in the same order
+    """
+    if not isinstance(language, str):
+        return route_text_chunk(texts, language)
+    emoji_decoder = worker_state['emoji_decoder']
+    if language == 'en':
+        text_processor = worker_state['text_processor']
+        return [clean_english_tweet(text, emoji_decoder, text_processor) for text in texts]
+    elif language == 'zh':
+        return [clean_chinese_tweet(text, emoji_decoder) for text in texts]
+    else:
+        raise ValueError('The language should be en or zh, got {}'.format(language))
+
+
+def iter_cleaned_chunks(texts, language, workers=None, chunk_size=5000, max_pending_chunks=None,
+                        emoji_path=None):
+    """
+    Clean the tweets in chunks on a process pool and yield the cleaned chunks in order. Each worker builds the
+    emoji decoder and the text processor once, and at most max_pending_chunks chunks are cleaned ahead of the caller
+    :param texts: a list of raw tweet texts
+    :param language: 'en' or 'zh', or a list of the language codes of the tweets. Each chunk is then routed
+    row by row to the cleaner of its language
+    :param workers: the number of worker processes. If None, use the number of cores.
+    If 1, clean the tweets in the current process
+    :param chunk_size: the number of tweets in one chunk
+    :param max_pending_chunks: the maximum number of chunks being cleaned ahead of the caller.
+    If None, use twice the number of workers
+    :param emoji_path: the path which saves the emoji.pkl. If None, use read_data.tweet_2017
+    :return: a generator of the lists of cleaned texts
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if max_pending_chunks is None:
+        max_pending_chunks = 2 * workers
+    chunks = (texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size))
+    if isinstance(language, str):
+        chunk_languages = repeat(language)
+        build_processor = language == 'en'
+    else:
+        chunk_languages = (language[start:start + chunk_size] for start in range(0, len(language), chunk_size))
+        build_processor = 'en' in set(language)
+    if workers == 1:
+        init_cleaning_worker(emoji_path, build_processor=build_processor)
+        for chunk, chunk_language in zip(chunks, chunk_languages):
+            yield clean_text_chunk(chunk, chunk_language)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_cleaning_worker,
+                             initargs=(emoji_path, build_processor)) as executor:
+        pending = deque()
+        for chunk, chunk_language in zip(chunks, chunk_languages):
+            pending.append(executor.submit(clean_text_chunk, chunk, chunk_language))
+            if len(pending) >= max_pending_chunks:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def clean_texts(texts, language, workers=None, chunk_size=5000, emoji_path=None):
+    cleaned_texts = []
+    for cleaned_chunk in iter_cleaned_chunks(texts, language, workers=workers, chunk_size=chunk_size,
+                                             emoji_path=emoji_path):
+        cleaned_texts.extend(cleaned_chunk)
+    return cleaned_texts
+
+
+def clean_tweets_in_parallel(dataframe, language, text_column='text', workers=None, chunk_size=5000,
+                             emoji_path=None, cache=None):
+    """
+    Clean the tweets of one language in a dataframe on a process pool
+    :param dataframe: a tweet dataframe, for instance, the English tweets
+    :param language: 'en' or 'zh', or a list of the language codes of the rows. See clean_tweets_by_language
+    :param text_column: the column which saves the raw tweet text
+    :param workers: the number of worker processes. If None, use the number of cores
+    :param chunk_size: the number of tweets in one chunk
+    :param emoji_path: the path which saves the emoji.pkl. If None, use read_data.tweet_2017
+    :param cache: a tweet_cleaning_cache.CleanedTextCache object. If given, only the tweets which are not in the
+    cache(for the current cleaning_pipeline_version) are cleaned, and their cleaned texts are added to the cache
+    :return: a pandas Series of the cleaned texts which shares the index(and row order) of the dataframe. Hence it
+    could be assigned to the dataframe directly and stays aligned with the id_str
+    """
+    texts = list(dataframe[text_column])
+    if cache is None:
+        cleaned_texts = clean_texts(texts, language, workers=workers, chunk_size=chunk_size, emoji_path=emoji_path)
+    else:
+        languages = repeat(language) if isinstance(language, str) else language
+        keys = [tweet_cleaning_cache.get_cache_key(text, text_language, cleaning_pipeline_version)
+                for text, text_language in zip(texts, languages)]
+        cleaned_text_dict = cache.get_many(keys)
+        # The missed texts are cleaned once even if they appear more than once, e.g. retweets
+        missed_text_dict = {}
+        missed_language_list = []
+        for position, key in enumerate(keys):
+            if key not in cleaned_text_dict and key not in missed_text_dict:
+                missed_text_dict[key] = texts[position]
+                if not isinstance(language, str):
+                    missed_language_list.append(language[position])
+        print('{} of {} tweets are found in the cleaned text cache'.format(
+            len(texts) - sum(key not in cleaned_text_dict for key in keys), len(texts)))
+        missed_cleaned_texts = clean_texts(list(missed_text_dict.values()),
+                                           language if isinstance(language, str) else missed_language_list,
+                                           workers=workers, chunk_size=chunk_size, emoji_path=emoji_path)
+        # The tweets in the languages without a cleaner are not cached
+        missed_items = [(key, cleaned_text) for key, cleaned_text in zip(missed_text_dict.keys(),
+                                                                           missed_cleaned_texts)
+                        if cleaned_text is not None]
+        cache.put_many(missed_items)
+        cleaned_text_dict.update(missed_items)
+        cleaned_texts = [cleaned_text_dict.get(key) for key in keys]
+    return pd.Series(cleaned_texts, index=dataframe.index, name='cleaned_text')
+
+
+def clean_tweets_by_language(dataframe, text_column='text', language_column='lang', workers=None, chunk_size=5000,
+                             emoji_path=None, cache=None):
+    """
+    Clean the English and the Chinese tweets of a dataframe in one pass. The rows are not split into one dataframe
+    per language: each chunk is routed row by row to the cleaner of its language code, and the cleaned texts are
+    written back by position. Hence the row order(e.g. by hk_time) is kept and no concat or re-sort is needed
+    :param dataframe: a tweet dataframe
+    :param text_column: the column which saves the raw tweet text
+    :param language_column: the column which saves the language code of the tweet, e.g. 'en' or 'zh'
+    :param workers: the number of worker processes. If None, use the number of cores
+    :param chunk_size: the number of tweets in one chunk
+    :param emoji_path: the path which saves the emoji.pkl. If None, use read_data.tweet_2017
+    :param cache: a tweet_cleaning_cache.CleanedTextCache object. See clean_tweets_in_parallel
+    :return: a pandas Series of the cleaned texts which shares the index of the dataframe. The tweets in other
+    languages get None
+    """
+    return clean_tweets_in_parallel(dataframe, list(dataframe[language_column]), text_column=text_column,
+                                    workers=workers, chunk_size=chunk_size, emoji_path=emoji_path, cache=cache)
@@ -0,0 +1,103 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+import read_data
+
+# The maximum number of cleaned texts kept in the cache. The least recently used ones are evicted beyond it
+default_max_entries = 5000000
+# The number of keys in one sqlite query
+query_batch_size = 500
+
+
+def get_cache_key(text, language, pipeline_version):
+    """
+    Compute the content address of a cleaned text
+    :param text: the raw tweet text
+    :param language: the language code of the tweet, e.g. 'en' or 'zh'
+    :param pipeline_version: the version of the cleaning pipeline
+    :return: a 16 bytes digest of the raw text, the language and the pipeline version
+    """
+    key_string = '{}\x00{}\x00{}'.format(pipeline_version, language, text)
+    return hashlib.blake2b(key_string.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class CleanedTextCache(object):
+
+    def __init__(self, cache_path=None, max_entries=default_max_entries):
+        """
+        A persistent key-value cache of the cleaned tweet texts saved in a sqlite database. The keys are the
+        content addresses computed by get_cache_key, and the least recently used texts are evicted when the
+        cache holds more than max_entries texts
+        :param cache_path: the path of the sqlite file. If None, use read_data.cleaned_text_cache_path
+        :param max_entries: the maximum number of cached texts
+        """
+        if cache_path is None:
+            cache_path = read_data.cleaned_text_cache_path
+        cache_directory = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(cache_directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cleaned_text '
+                                '(key BLOB PRIMARY KEY, value TEXT, last_used REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS cleaned_text_last_used ON cleaned_text (last_used)')
+        self.connection.commit()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM cleaned_text').fetchone()[0]
+
+    def get_many(self, keys):
+        """
+        Look up the cleaned texts and mark the hit ones as recently used
+        :param keys: a list of keys computed by get_cache_key
+        :return: a dict which maps the hit keys to the cleaned texts
+        """
+        result = {}
+        unique_keys = list(set(keys))
+        for start in range(0, len(unique_keys), query_batch_size):
+            batch = unique_keys[start:start + query_batch_size]
+            rows = self.connection.execute('SELECT key, value FROM cleaned_text WHERE key IN ({})'.format(
+                ','.join('?' * len(batch))), batch).fetchall()
+            result.update(rows)
+        now = time.time()
+        self.connection.executemany('UPDATE cleaned_text SET last_used = ? WHERE key = ?',
+                                    [(now, key) for key in result])
+        self.connection.commit()
+        hit_number = sum(key in result for key in keys)
+        self.hit_count += hit_number
+        self.miss_count += len(keys) - hit_number
+        return result
+
+    def put_many(self, items):
+        """
+        Save the cleaned texts and evict the least recently used ones beyond the size cap
+        :param items: a list of (key, cleaned text) pairs
+        """
+        now = time.time()
+        self.connection.executemany('INSERT OR REPLACE INTO cleaned_text (key, value, last_used) VALUES (?, ?, ?)',
+                                    [(key, value, now) for key, value in items])
+        self.connection.commit()
+        self.evict()
+
+    def evict(self):
+        extra_number = len(self) - self.max_entries
+        if extra_number > 0:
+            self.connection.execute('DELETE FROM cleaned_text WHERE key IN (SELECT key FROM cleaned_text '
+                                    'ORDER BY last_used LIMIT ?)', (extra_number,))
+            self.connection.commit()
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cleaned_text')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,203 @@
+import os
+import numpy as np
+import pandas as pd
+
+import tweet_store
+import utils
+
+# The constants of the splitmix64 hash used by the Bloom filter
+golden_gamma = np.uint64(0x9E3779B97F4A7C15)
+mix_constant_1 = np.uint64(0xBF58476D1CE4E5B9)
+mix_constant_2 = np.uint64(0x94D049BB133111EB)
+
+
+def hash_ids(ids, seed):
+    """
+    Hash the tweet ids with the splitmix64 mixing function in one vectorized pass
+    :param ids: a numpy int64 array of tweet ids
+    :param seed: an integer seed. Different seeds give independent hash functions
+    :return: a numpy uint64 array of hash values
+    """
+    # The multiplications wrap around on purpose
+    with np.errstate(over='ignore'):
+        hash_values = ids.astype(np.uint64) + golden_gamma * np.uint64(seed + 1)
+        hash_values = (hash_values ^ (hash_values >> np.uint64(30))) * mix_constant_1
+        hash_values = (hash_values ^ (hash_values >> np.uint64(27))) * mix_constant_2
+        return hash_values ^ (hash_values >> np.uint64(31))
+
+
+class BloomFilter(object):
+
+    def __init__(self, capacity, bits_per_id=10, hash_number=7):
+        """
+        A Bloom filter on the tweet ids. It never misses an inserted id, and rejects most of the unseen ids in
+        constant time without touching the sorted id array
+        :param capacity: the expected number of ids
+        :param bits_per_id: the number of bits for each id. 10 bits with 7 hashes give about 1% false positives
+        :param hash_number: the number of hash functions
+        """
+        self.bit_number = max(int(capacity * bits_per_id), 64)
+        self.hash_number = hash_number
+        # The bits are packed in a uint8 array, 8 bits per byte
+        self.bits = np.zeros((self.bit_number + 7) // 8, dtype=np.uint8)
+
+    def get_positions(self, ids, seed):
+        return (hash_ids(ids, seed) % np.uint64(self.bit_number)).astype(np.int64)
+
+    def add(self, ids):
+        for seed in range(self.hash_number):
+            positions = self.get_positions(ids, seed)
+            # bitwise_or.at handles the positions which share a byte
+            np.bitwise_or.at(self.bits, positions >> 3, np.left_shift(1, positions & 7).astype(np.uint8))
+
+    def might_contain(self, ids):
+        result = np.ones(len(ids), dtype=bool)
+        for seed in range(self.hash_number):
+            positions = self.get_positions(ids, seed)
+            result &= ((self.bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & np.uint8(1)) != 0
+        return result
+
+
+class IdStrIndex(object):
+
+    def __init__(self, ids=None, use_bloom_filter=False, bits_per_id=10):
+        """
+        A deduplication index on the id_str of the tweets, saved as a sorted int64 numpy array(8 bytes per tweet).
+        New ids are kept in a small buffer and merged to the sorted array in batches
+        :param ids: the ids already in the index
+        :param use_bloom_filter: if True, check a Bloom filter before searching the sorted array
+        :param bits_per_id: the number of bits for each id in the Bloom filter
+        """
+        if ids is None:
+            ids = np.array([], dtype=np.int64)
+        self.sorted_ids = np.unique(np.asarray(ids, dtype=np.int64))
+        self.pending_ids = []
+        self.pending_number = 0
+        self.use_bloom_filter = use_bloom_filter
+        self.bits_per_id = bits_per_id
+        self.bloom_filter = None
+        if use_bloom_filter:
+            self.build_bloom_filter()
+
+    def __len__(self):
+        self.merge_pending_ids()
+        return len(self.sorted_ids)
+
+    def build_bloom_filter(self, capacity=None):
+        # Leave room for the ids added later. The filter is rebuilt when the index grows beyond its capacity
+        if capacity is None:
+            capacity = 2 * (len(self.sorted_ids) + self.pending_number) + 1000000
+        self.bloom_filter = BloomFilter(capacity=capacity, bits_per_id=self.bits_per_id)
+        self.bloom_filter_capacity = capacity
+        self.bloom_filter.add(self.sorted_ids)
+        for pending_id_array in self.pending_ids:
+            self.bloom_filter.add(pending_id_array)
+
+    def merge_pending_ids(self):
+        if self.pending_ids:
+            self.sorted_ids = np.union1d(self.sorted_ids, np.concatenate(self.pending_ids))
+            self.pending_ids = []
+            self.pending_number = 0
+
+    def contains(self, ids):
+        """
+        Check whether the ids are in the index
+        :param ids: a numpy int64 array of tweet ids
+        :return: a boolean numpy array
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.use_bloom_filter:
+            result = self.bloom_filter.might_contain(ids)
+            candidate_positions = np.flatnonzero(result)
+            # Only the ids which pass the Bloom filter are searched in the sorted array
+            result[candidate_positions] = self.contains_exactly(ids[candidate_positions])
+            return result
+        return self.contains_exactly(ids)
+
+    def contains_exactly(self, ids):
+        result = np.zeros(len(ids), dtype=bool)
+        if len(self.sorted_ids) > 0:
+            positions = np.searchsorted(self.sorted_ids, ids)
+            positions[positions == len(self.sorted_ids)] = 0
+            result = self.sorted_ids[positions] == ids
+        if self.pending_ids:
+            result |= pd.Index(np.concatenate(self.pending_ids)).get_indexer(ids) != -1
+        return result
+
+    def add(self, ids):
+        """
+        Add the ids to the index
+        :param ids: a numpy int64 array of tweet ids which are not in the index yet
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        self.pending_ids.append(ids)
+        self.pending_number += len(ids)
+        if self.pending_number > max(1000000, len(self.sorted_ids) // 10):
+            self.merge_pending_ids()
+        if self.use_bloom_filter:
+            if len(self.sorted_ids) + self.pending_number > self.bloom_filter_capacity:
+                self.build_bloom_filter()
+            else:
+                self.bloom_filter.add(ids)
+
+    def save(self, index_path):
+        self.merge_pending_ids()
+        np.save(index_path, self.sorted_ids)
+
+    @staticmethod
+    def load(index_path, use_bloom_filter=False):
+        if os.path.exists(index_path):
+            return IdStrIndex(np.load(index_path), use_bloom_filter=use_bloom_filter)
+        return IdStrIndex(use_bloom_filter=use_bloom_filter)
+
+
+# The deduplication index of a tweet table is saved next to its parquet dataset,
+# e.g. tweet_store_path/tweet_combined_id_index.npy
+def get_id_index_path(table_name, store_path=None):
+    return tweet_store.get_store_path(table_name, store_path) + '_id_index.npy'
+
+
+def load_id_index(table_name, store_path=None, use_bloom_filter=False):
+    return IdStrIndex.load(get_id_index_path(table_name, store_path), use_bloom_filter=use_bloom_filter)
+
+
+def save_id_index(id_index, table_name, store_path=None):
+    id_index.save(get_id_index_path(table_name, store_path))
+
+
+def build_id_index_from_store(table_name, store_path=None, use_bloom_filter=False):
+    """
+    Build the deduplication index from the id_str column of a tweet table which is already in the tweet store
+    :param table_name: the name of the tweet table
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    :param use_bloom_filter: whether to use a Bloom filter in front of the sorted id array
+    :return: an IdStrIndex object
+    """
+    id_dataframe = tweet_store.read_tweet_store(table_name, columns=['id_str'], store_path=store_path,
+                                                sort=False)
+    ids = utils.parse_id_str(id_dataframe['id_str']).dropna().to_numpy(dtype=np.int64)
+    id_index = IdStrIndex(ids, use_bloom_filter=use_bloom_filter)
+    save_id_index(id_index, table_name, store_path)
+    return id_index
+
+
+def drop_duplicate_tweets(dataframe, id_index):
+    """
+    Drop the tweets whose id_str is already in the index or appears more than once in the dataframe, and add the
+    remaining ids to the index
+    :param dataframe: a tweet dataframe with the id_str column
+    :param id_index: an IdStrIndex object
+    :return: the deduplicated dataframe and the number of dropped duplicates
+    """
+    id_str_values = utils.parse_id_str(dataframe['id_str'])
+    valid_mask = id_str_values.notnull().to_numpy()
+    ids = id_str_values[valid_mask].to_numpy(dtype=np.int64)
+    # The tweets without a valid id_str could not be checked and are kept
+    new_mask = ~valid_mask
+    # A tweet is new if it is not in the index and it is the first occurrence in this dataframe
+    new_id_mask = ~id_index.contains(ids) & ~pd.Series(ids).duplicated().to_numpy()
+    new_mask[valid_mask] = new_id_mask
+    id_index.add(ids[new_id_mask])
+    return dataframe.loc[new_mask], int(len(ids) - new_id_mask.sum())
@@ -0,0 +1,452 @@
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import read_data
+import tweet_token_store
+
+# The dimension of the Phrase2Vec vectors(the fastText word vectors combined with the emoji2vec vectors)
+default_dimension = 100
+# The number of tweets averaged at once. The token vectors of a chunk are gathered into one temporary array
+default_chunk_size = 50000
+# The maximum number of out-of-vocabulary word vectors kept by CachedWordVectors
+default_oov_cache_size = 500000
+
+
+def get_word_vector_vocabulary(word_vectors):
+    # The vocabulary of a gensim FastText model or KeyedVectors. gensim 4 renamed vocab to key_to_index
+    keyed_vectors = getattr(word_vectors, 'wv', word_vectors)
+    if hasattr(keyed_vectors, 'key_to_index'):
+        return keyed_vectors.key_to_index
+    return keyed_vectors.vocab
+
+
+class CachedWordVectors(object):
+
+    def __init__(self, word_vectors, max_size=default_oov_cache_size):
+        """
+        A bounded LRU cache in front of the fastText word vectors. The vector of an out-of-vocabulary token, e.g. a
+        hashtag, an elongated word or a typo, is computed from its character n-grams on every lookup. Hence the OOV
+        vectors(and the OOV tokens without any known n-gram) are cached, while the vocabulary words are looked up
+        directly. It could be passed to Phrase2Vec in place of the fastText model. The cache pays off when the
+        tokens are looked up tweet by tweet, e.g. in the emoji2vec notebook. EmbeddingEngine looks up each distinct
+        token only once, so it does not need the cache
+        :param word_vectors: a gensim FastText model or its KeyedVectors
+        :param max_size: the maximum number of cached OOV tokens. The least recently used ones are evicted
+        """
+        self.word_vectors = word_vectors
+        self.vocabulary = get_word_vector_vocabulary(word_vectors)
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hit_count = 0
+        self.miss_count = 0
+        # The time spent on computing the OOV vectors of the cache misses
+        self.miss_time = 0.0
+        # Phrase2Vec checks `token in model` before `model[token]`. The result of the check is kept, so the
+        # following lookup of the same token is neither computed nor counted again
+        self.last_token = None
+        self.last_vector = None
+
+    def get_vector(self, token):
+        """
+        Look up the vector of a token
+        :param token: a token
+        :return: the vector of the token, or None if fastText could not build a vector for it
+        """
+        if token in self.vocabulary:
+            return self.word_vectors[token]
+        if token in self.cache:
+            self.hit_count += 1
+            self.cache.move_to_end(token)
+            return self.cache[token]
+        self.miss_count += 1
+        start_time = time.perf_counter()
+        vector = self.word_vectors[token] if token in self.word_vectors else None
+        self.miss_time += time.perf_counter() - start_time
+        self.cache[token] = vector
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return vector
+
+    def __contains__(self, token):
+        self.last_token, self.last_vector = token, self.get_vector(token)
+        return self.last_vector is not None
+
+    def __getitem__(self, token):
+        if self.last_token is not None and token == self.last_token:
+            vector = self.last_vector
+            self.last_token, self.last_vector = None, None
+        else:
+            vector = self.get_vector(token)
+        if vector is None:
+            raise KeyError('all ngrams for word {} absent from model'.format(token))
+        return vector
+
+    def get_cache_stats(self):
+        """
+        Get the statistics of the OOV cache
+        :return: a dict of the hit count, the miss count, the hit rate, the time spent on the misses and the
+        estimated time saved by the hits(the hit count times the average time of a miss), in seconds
+        """
+        lookup_count = self.hit_count + self.miss_count
+        average_miss_time = self.miss_time / self.miss_count if self.miss_count else 0.0
+        return {'hits': self.hit_count, 'misses': self.miss_count,
+                'hit_rate': self.hit_count / lookup_count if lookup_count else 0.0,
+                'miss_time': self.miss_time, 'saved_time': self.hit_count * average_miss_time}
+
+    def print_cache_stats(self):
+        stats = self.get_cache_stats()
+        print('OOV vector cache: {} hits, {} misses, hit rate {:.1%}'.format(
+            stats['hits'], stats['misses'], stats['hit_rate']))
+        print('{:.2f} seconds spent on the misses, about {:.2f} seconds saved by the hits'.format(
+            stats['miss_time'], stats['saved_time']))
+
+
+def average_token_ids(embedding_matrix, token_ids, offsets, chunk_size=default_chunk_size):
+    """
+    Average the token vectors of each tweet
+    :param embedding_matrix: a (vocabulary size x dimension) array. The i-th row is the vector of the token id i
+    :param token_ids: a numpy array of the token ids of all the tweets
+    :param offsets: a numpy array. The token ids of the i-th tweet are token_ids[offsets[i]:offsets[i + 1]]
+    :param chunk_size: the number of tweets averaged at once
+    :return: a (number of tweets x dimension) float32 array. The tweets without any token get a zero vector
+    """
+    tweet_number = len(offsets) - 1
+    tweet_vectors = np.zeros((tweet_number, embedding_matrix.shape[1]), dtype=np.float32)
+    for start in range(0, tweet_number, chunk_size):
+        stop = min(start + chunk_size, tweet_number)
+        chunk_offsets = np.asarray(offsets[start:stop + 1], dtype=np.int64)
+        lengths = np.diff(chunk_offsets)
+        # np.add.reduceat gives the first element, not zero, for an empty segment. Hence the sums are only
+        # computed for the tweets with tokens, whose segments then cover all the gathered token vectors
+        nonempty = lengths > 0
+        if not nonempty.any():
+            continue
+        token_vectors = embedding_matrix[token_ids[chunk_offsets[0]:chunk_offsets[-1]]]
+        token_sums = np.add.reduceat(token_vectors, (chunk_offsets[:-1] - chunk_offsets[0])[nonempty], axis=0,
+                                     dtype=np.float64)
+        tweet_vectors[start:stop][nonempty] = token_sums / lengths[nonempty, None]
+    return tweet_vectors
+
+
+def embed_token_store(embedding_matrix, token_store, positions=None, chunk_size=default_chunk_size):
+    """
+    Average the token vectors of the tweets in a token store
+    :param embedding_matrix: a (vocabulary size x dimension) array whose rows follow the vocabulary of the token
+    store, e.g. EmbeddingEngine.embedding_matrix or the vector table saved by save_vector_table
+    :param token_store: a tweet_token_store.TokenStore object
+    :param positions: a numpy array of the positions of the selected tweets in the token store. If None, use all
+    :param chunk_size: the number of tweets averaged at once
+    :return: a (number of tweets x dimension) float32 array. The tweets without any token get a zero vector
+    """
+    if positions is None:
+        return average_token_ids(embedding_matrix, token_store.token_ids, token_store.offsets, chunk_size=chunk_size)
+    tweet_vectors = np.zeros((len(positions), embedding_matrix.shape[1]), dtype=np.float32)
+    for start in range(0, len(positions), chunk_size):
+        chunk_positions = np.asarray(positions[start:start + chunk_size])
+        starts = token_store.offsets[chunk_positions]
+        lengths = token_store.offsets[chunk_positions + 1] - starts
+        chunk_offsets = np.zeros(len(chunk_positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=chunk_offsets[1:])
+        # The index of each token of the selected tweets in the flat token id array of the token store
+        token_index = np.repeat(starts - chunk_offsets[:-1], lengths) + np.arange(chunk_offsets[-1])
+        tweet_vectors[start:start + len(chunk_positions)] = average_token_ids(
+            embedding_matrix, token_store.token_ids[token_index], chunk_offsets, chunk_size=chunk_size)
+    return tweet_vectors
+
+
+class EmbeddingEngine(object):
+
+    def __init__(self, p2v, vocabulary=None, dimension=default_dimension):
+        """
+        Compute the average token vectors of the tweets. The vector of each distinct token is looked up once from
+        the Phrase2Vec model and saved as a row of one (vocabulary size x dimension) matrix, and the tweets are
+        then averaged with segment sums over the flat array of token ids
+        :param p2v: a Phrase2Vec object. p2v[token] returns the vector of the token(a zero vector for unknown tokens)
+        :param vocabulary: a list of tokens, e.g. the vocabulary of a TokenStore. The id of a token is its position,
+        so the token ids of the token store could be used directly
+        :param dimension: the dimension of the vectors
+        """
+        self.p2v = p2v
+        self.dimension = dimension
+        self.token_id_dict = {}
+        self.embedding_matrix = np.zeros((0, dimension), dtype=np.float32)
+        if vocabulary is not None:
+            self.get_token_ids(vocabulary)
+
+    def __len__(self):
+        return len(self.token_id_dict)
+
+    def get_token_ids(self, tokens):
+        """
+        Map the tokens to their ids. The vectors of the new tokens are looked up and added to the embedding matrix
+        :param tokens: a list of tokens
+        :return: a numpy int32 array of token ids
+        """
+        token_ids = np.empty(len(tokens), dtype=np.int32)
+        new_vectors = []
+        for position, token in enumerate(tokens):
+            token_id = self.token_id_dict.get(token)
+            if token_id is None:
+                token_id = len(self.token_id_dict)
+                self.token_id_dict[token] = token_id
+                new_vectors.append(np.asarray(self.p2v[token], dtype=np.float32))
+            token_ids[position] = token_id
+        if new_vectors:
+            self.embedding_matrix = np.vstack([self.embedding_matrix, np.stack(new_vectors)])
+        return token_ids
+
+    def average_token_ids(self, token_ids, offsets, chunk_size=default_chunk_size):
+        # See the function average_token_ids
+        return average_token_ids(self.embedding_matrix, token_ids, offsets, chunk_size=chunk_size)
+
+    def embed_token_lists(self, token_lists, chunk_size=default_chunk_size):
+        """
+        Average the token vectors of each token list
+        :param token_lists: a list of token lists
+        :param chunk_size: the number of tweets averaged at once
+        :return: a (number of tweets x dimension) float32 array. The empty token lists get a zero vector
+        """
+        offsets = np.zeros(len(token_lists) + 1, dtype=np.int64)
+        np.cumsum([len(tokens) for tokens in token_lists], out=offsets[1:])
+        token_ids = self.get_token_ids([token for tokens in token_lists for token in tokens])
+        return self.average_token_ids(token_ids, offsets, chunk_size=chunk_size)
+
+    def embed_token_store(self, token_store, positions=None, chunk_size=default_chunk_size):
+        """
+        Average the token vectors of the tweets in a token store. The engine should be built with the vocabulary
+        of the token store
+        :param token_store: a tweet_token_store.TokenStore object
+        :param positions: a numpy array of the positions of the selected tweets in the token store. If None, use all
+        :param chunk_size: the number of tweets averaged at once
+        :return: a (number of tweets x dimension) float32 array. The tweets without any token get a zero vector
+        """
+        if len(self) < len(token_store.vocabulary):
+            self.get_token_ids(token_store.vocabulary[len(self):])
+        return embed_token_store(self.embedding_matrix, token_store, positions, chunk_size=chunk_size)
+
+
+def iter_tweet_vector_chunks(dataframe, p2v, token_store=None, tokenizer_name='tweet', text_column='cleaned_text',
+                             dimension=default_dimension, chunk_size=default_chunk_size):
+    """
+    Compute the average token vectors of the tweets in a dataframe chunk by chunk. The embedding matrix is built once
+    and shared by all the chunks
+    :param dataframe: a tweet dataframe with the id_str and the text column
+    :param p2v: a Phrase2Vec object
+    :param token_store: a TokenStore object built with the tokenizer. The tweets in it whose text is
+    unchanged are not tokenized again
+    :param tokenizer_name: the tokenizer used for the tweets which are not in the token store
+    :param text_column: the column of the cleaned text
+    :param dimension: the dimension of the vectors
+    :param chunk_size: the number of tweets in one chunk
+    :return: a generator of (the row position of the first tweet of the chunk, a (chunk size x dimension) float32
+    array). The tweets without any token get a zero vector
+    """
+    if token_store is None:
+        engine = EmbeddingEngine(p2v, dimension=dimension)
+        positions = np.full(len(dataframe), -1)
+    else:
+        engine = EmbeddingEngine(p2v, vocabulary=token_store.vocabulary, dimension=dimension)
+        positions = token_store.get_positions(dataframe['id_str'], texts=dataframe[text_column])
+    for start in range(0, len(dataframe), chunk_size):
+        chunk_positions = positions[start:start + chunk_size]
+        found = chunk_positions >= 0
+        tweet_vectors = np.zeros((len(chunk_positions), dimension), dtype=np.float32)
+        if found.any():
+            tweet_vectors[found] = engine.embed_token_store(token_store, chunk_positions[found], chunk_size=chunk_size)
+        if not found.all():
+            tweet_vectors[~found] = engine.embed_token_lists(tweet_token_store.get_token_lists(
+                dataframe.iloc[np.flatnonzero(~found) + start], tokenizer_name=tokenizer_name,
+                text_column=text_column), chunk_size=chunk_size)
+        yield start, tweet_vectors
+
+
+def get_tweet_vectors(dataframe, p2v, token_store=None, tokenizer_name='tweet', text_column='cleaned_text',
+                      dimension=default_dimension, chunk_size=default_chunk_size):
+    """
+    Compute the average token vectors of the tweets in a dataframe. See iter_tweet_vector_chunks
+    :return: a (number of tweets x dimension) float32 array in the row order of the dataframe
+    """
+    tweet_vectors = np.zeros((len(dataframe), dimension), dtype=np.float32)
+    for start, chunk_vectors in iter_tweet_vector_chunks(dataframe, p2v, token_store=token_store,
+                                                         tokenizer_name=tokenizer_name, text_column=text_column,
+                                                         dimension=dimension, chunk_size=chunk_size):
+        tweet_vectors[start:start + len(chunk_vectors)] = chunk_vectors
+    return tweet_vectors
+
+
+def get_index_path(vector_path):
+    # The id_str of the rows of tweet_combined_repre.npy are saved in tweet_combined_repre_id_str.npy
+    return os.path.splitext(vector_path)[0] + '_id_str.npy'
+
+
+def write_tweet_vectors(dataframe, p2v, vector_path=None, token_store=None, tokenizer_name='tweet',
+                        text_column='cleaned_text', dimension=default_dimension, chunk_size=default_chunk_size):
+    """
+    Compute the average token vectors of the tweets and write them chunk by chunk into a preallocated npy file.
+    Hence only one chunk of vectors is kept in memory. The id_str of the rows are saved in an index file next to it
+    :param dataframe: a tweet dataframe with the id_str and the text column
+    :param p2v: a Phrase2Vec object
+    :param vector_path: the path of the npy file. If None, use read_data.tweet_combined_representation
+    :param token_store: a TokenStore object built with the tokenizer. See iter_tweet_vector_chunks
+    :param tokenizer_name: the tokenizer used for the tweets which are not in the token store
+    :param text_column: the column of the cleaned text
+    :param dimension: the dimension of the vectors
+    :param chunk_size: the number of tweets written at once
+    :return: the path of the npy file
+    """
+    if vector_path is None:
+        vector_path = read_data.tweet_combined_representation
+    os.makedirs(os.path.dirname(os.path.abspath(vector_path)), exist_ok=True)
+    # Write to a temporary file first, so an interrupted job never leaves a half written array
+    tweet_vectors = np.lib.format.open_memmap(vector_path + '.tmp', mode='w+', dtype=np.float32,
+                                              shape=(len(dataframe), dimension))
+    for start, chunk_vectors in iter_tweet_vector_chunks(dataframe, p2v, token_store=token_store,
+                                                         tokenizer_name=tokenizer_name, text_column=text_column,
+                                                         dimension=dimension, chunk_size=chunk_size):
+        tweet_vectors[start:start + len(chunk_vectors)] = chunk_vectors
+        tweet_vectors.flush()
+        print('The vectors of the first {} tweets have been written'.format(start + len(chunk_vectors)))
+    # Close the memmap before the file is renamed
+    del tweet_vectors
+    os.replace(vector_path + '.tmp', vector_path)
+    np.save(get_index_path(vector_path), tweet_token_store.get_id_str_array(dataframe['id_str']))
+    return vector_path
+
+
+def load_tweet_vectors(vector_path=None, mmap_mode='r'):
+    """
+    Open the tweet vectors written by write_tweet_vectors
+    :param vector_path: the path of the npy file. If None, use read_data.tweet_combined_representation
+    :param mmap_mode: the mmap mode of the vector array. Hence only the touched rows are read from the disk
+    :return: the vector array and a pandas Index of the id_str(int64) of its rows
+    """
+    import pandas as pd
+    if vector_path is None:
+        vector_path = read_data.tweet_combined_representation
+    return np.load(vector_path, mmap_mode=mmap_mode), pd.Index(np.load(get_index_path(vector_path)))
+
+
+def get_vector_table_path(vector_path):
+    # The vector table of tweet_combined_repre.npy is saved in tweet_combined_repre_vector_table.npy
+    return os.path.splitext(vector_path)[0] + '_vector_table.npy'
+
+
+def save_vector_table(p2v, token_store, table_path, dimension=default_dimension):
+    """
+    Look up the vectors of the vocabulary of a token store once and save them as one npy array. The worker processes
+    open it as a read-only memmap, so they share one copy of the vectors in the page cache and never load the
+    fastText model or the emoji2vec vectors
+    :param p2v: a Phrase2Vec object
+    :param token_store: a TokenStore object
+    :param table_path: the path of the npy file
+    :param dimension: the dimension of the vectors
+    :return: the EmbeddingEngine built with the vocabulary of the token store
+    """
+    engine = EmbeddingEngine(p2v, vocabulary=token_store.vocabulary, dimension=dimension)
+    np.save(table_path, engine.embedding_matrix)
+    return engine
+
+
+# The vector table, the token store and the output array of a representation worker process, opened once by
+# init_vector_worker
+vector_worker_state = {}
+
+
+def init_vector_worker(table_path, store_path, vector_path):
+    """
+    Open the vector table, the token store and the output array as memmaps in a representation worker process
+    :param table_path: the path of the vector table saved by save_vector_table
+    :param store_path: the path of the token store
+    :param vector_path: the path of the output npy file preallocated by write_tweet_vectors_in_parallel
+    """
+    vector_worker_state['embedding_matrix'] = np.load(table_path, mmap_mode='r')
+    vector_worker_state['token_store'] = tweet_token_store.TokenStore.load(store_path, mmap_mode='r')
+    vector_worker_state['tweet_vectors'] = np.load(vector_path, mmap_mode='r+')
+
+
+def write_vector_shard(row_positions, store_positions, chunk_size=default_chunk_size):
+    """
+    Average the token vectors of a shard of tweets and write them to their rows of the output array
+    :param row_positions: a numpy array of the rows of the tweets in the output array
+    :param store_positions: a numpy array of the positions of the tweets in the token store
+    :param chunk_size: the number of tweets averaged at once
+    :return: the number of written tweets
+    """
+    tweet_vectors = vector_worker_state['tweet_vectors']
+    tweet_vectors[row_positions] = embed_token_store(vector_worker_state['embedding_matrix'],
+                                                     vector_worker_state['token_store'], store_positions,
+                                                     chunk_size=chunk_size)
+    tweet_vectors.flush()
+    return len(row_positions)
+
+
+def write_tweet_vectors_in_parallel(dataframe, p2v, vector_path=None, tokenizer_name='tweet', store_path=None,
+                                   text_column='cleaned_text', dimension=default_dimension, workers=None,
+                                   shard_size=default_chunk_size):
+    """
+    Compute the average token vectors of the tweets on a process pool and write them into a preallocated npy file.
+    The vectors of the token store vocabulary are saved once in a vector table next to the npy file, and the tweets
+    are sharded across the worker processes, which only open the vector table and the token store as read-only
+    memmaps. Hence adding workers does not multiply the memory used by the word vectors
+    :param dataframe: a tweet dataframe with the id_str and the text column
+    :param p2v: a Phrase2Vec object. It is only used in the current process
+    :param vector_path: the path of the npy file. If None, use read_data.tweet_combined_representation
+    :param tokenizer_name: the tokenizer of the token store, e.g. 'tweet'
+    :param store_path: the path which saves the token stores. If None, use read_data.token_store_path
+    :param text_column: the column of the cleaned text
+    :param dimension: the dimension of the vectors
+    :param workers: the number of worker processes. If None, use the number of cores. If 1, compute the vectors in
+    the current process
+    :param shard_size: the number of tweets in one shard
+    :return: the path of the npy file
+    """
+    if vector_path is None:
+        vector_path = read_data.tweet_combined_representation
+    if workers is None:
+        workers = os.cpu_count()
+    os.makedirs(os.path.dirname(os.path.abspath(vector_path)), exist_ok=True)
+    token_store_path = tweet_token_store.get_token_store_path(tokenizer_name, store_path)
+    token_store = tweet_token_store.TokenStore.load(token_store_path, mmap_mode='r')
+    table_path = get_vector_table_path(vector_path)
+    engine = save_vector_table(p2v, token_store, table_path, dimension=dimension)
+    print('The vector table of {} tokens has been saved'.format(len(engine)))
+
+    # Write to a temporary file first, so an interrupted job never leaves a half written array
+    temporary_path = vector_path + '.tmp'
+    tweet_vectors = np.lib.format.open_memmap(temporary_path, mode='w+', dtype=np.float32,
+                                              shape=(len(dataframe), dimension))
+    positions = token_store.get_positions(dataframe['id_str'], texts=dataframe[text_column])
+    found = positions >= 0
+    # The few tweets which are not in the token store are tokenized and averaged in the current process
+    if not found.all():
+        tweet_vectors[~found] = engine.embed_token_lists(tweet_token_store.get_token_lists(
+            dataframe.iloc[np.flatnonzero(~found)], tokenizer_name=tokenizer_name, text_column=text_column))
+    tweet_vectors.flush()
+    # Close the memmap before the workers open the file
+    del tweet_vectors
+
+    row_positions = np.flatnonzero(found)
+    shards = [(row_positions[start:start + shard_size], positions[row_positions[start:start + shard_size]])
+              for start in range(0, len(row_positions), shard_size)]
+    written_number = 0
+    if workers == 1:
+        init_vector_worker(table_path, token_store_path, temporary_path)
+        for shard_rows, shard_positions in shards:
+            written_number += write_vector_shard(shard_rows, shard_positions)
+        vector_worker_state.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_vector_worker,
+                                 initargs=(table_path, token_store_path, temporary_path)) as executor:
+            futures = [executor.submit(write_vector_shard, shard_rows, shard_positions)
+                       for shard_rows, shard_positions in shards]
+            for future in futures:
+                written_number += future.result()
+    print('The vectors of {} tweets in the token store have been written by {} workers'.format(
+        written_number, workers))
+    os.replace(temporary_path, vector_path)
+    np.save(get_index_path(vector_path), tweet_token_store.get_id_str_array(dataframe['id_str']))
+    return vector_path
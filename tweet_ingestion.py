@@ -0,0 +1,207 @@
+import os
+import csv
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import read_data
+import utils
+import tweet_store
+import tweet_dedup
+
+# The columns we keep from the raw tweet csv files
+selected_name_list = ['created_at', 'id_str', 'lang', 'lat', 'lon', 'place_id', 'place_lat', 'place_lon',
+                      'place_name', 'text', 'time_zone', 'truncated', 'url', 'user_created_at', 'user_id_str',
+                      'user_lang', 'user_url', 'verified']
+# We only consider the Chinese and English tweets
+considered_languages = ['zh', 'en']
+
+
+def read_filtered_raw_csv(file_path):
+    """
+    Load one raw tweet csv file, only keeping the selected columns and the tweets we consider:
+    Chinese or English tweets, posted by unverified accounts and with geoinformation
+    :param file_path: the path of the raw tweet csv file
+    :return: the filtered tweet dataframe
+    """
+    dataframe = pd.read_csv(file_path, encoding='latin-1', dtype='str', quoting=csv.QUOTE_NONNUMERIC,
+                            usecols=lambda column_name: column_name in selected_name_list)
+    selected_mask = dataframe['lang'].isin(considered_languages) & (dataframe['verified'] == 'FALSE') & \
+        dataframe['lat'].notnull()
+    return dataframe.loc[selected_mask]
+
+
+def list_raw_csv_files(*paths):
+    file_paths = []
+    for path in paths:
+        for file in sorted(os.listdir(path)):
+            file_paths.append(os.path.join(path, file))
+    return file_paths
+
+
+def iter_filtered_raw_csv_files(file_paths, workers=None, max_pending_files=None):
+    """
+    Parse the raw tweet csv files on a process pool and yield the filtered dataframe of each file in order.
+    The column selection and the tweet filters are done in the worker processes, and at most max_pending_files
+    files are parsed ahead of the caller, so the unfiltered columns are never kept in the main process
+    :param file_paths: the paths of the raw tweet csv files
+    :param workers: the number of worker processes. If None, use the number of cores
+    :param max_pending_files: the maximum number of files being parsed ahead of the caller.
+    If None, use twice the number of workers
+    :return: a generator of (file path, filtered tweet dataframe) pairs
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if max_pending_files is None:
+        max_pending_files = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for file_path in file_paths:
+            pending.append((file_path, executor.submit(read_filtered_raw_csv, file_path)))
+            if len(pending) >= max_pending_files:
+                finished_file_path, future = pending.popleft()
+                yield finished_file_path, future.result()
+        while pending:
+            finished_file_path, future = pending.popleft()
+            yield finished_file_path, future.result()
+
+
+def iter_filtered_raw_tweets(*paths, workers=None, max_pending_files=None):
+    """
+    Parse all the raw tweet csv files saved in the paths on a process pool
+    :param paths: the paths which save the raw tweet csv files, e.g. the paths of the 2016, 2017 and 2018 tweets
+    :param workers: the number of worker processes. If None, use the number of cores
+    :param max_pending_files: the maximum number of files being parsed ahead of the caller
+    :return: a generator of (file path, filtered tweet dataframe) pairs
+    """
+    return iter_filtered_raw_csv_files(list_raw_csv_files(*paths), workers=workers,
+                                       max_pending_files=max_pending_files)
+
+
+# The size and the modification time of a raw file. A processed file whose signature changes is ingested again
+def get_file_signature(file_path):
+    file_stat = os.stat(file_path)
+    return {'size': file_stat.st_size, 'mtime': file_stat.st_mtime}
+
+
+def load_id_index_for_ingestion(manifest, table_name, store_path=None, use_bloom_filter=False):
+    """
+    Load the deduplication index of a tweet table before an incremental ingestion
+    :param manifest: the manifest dict of the tweet table
+    :param table_name: the name of the tweet table
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    :param use_bloom_filter: whether to use a Bloom filter in front of the sorted id array
+    :return: an IdStrIndex object
+    """
+    if manifest.get('id_index_saved', False):
+        return tweet_dedup.load_id_index(table_name, store_path=store_path, use_bloom_filter=use_bloom_filter)
+    if manifest['processed_files']:
+        # The last run was interrupted before the index was saved. Rebuild it from the ids in the tweet store
+        print('Rebuilding the id_str index of {} from the tweet store...'.format(table_name))
+        return tweet_dedup.build_id_index_from_store(table_name, store_path=store_path,
+                                                     use_bloom_filter=use_bloom_filter)
+    return tweet_dedup.IdStrIndex(use_bloom_filter=use_bloom_filter)
+
+
+def remove_ingested_table(table_name, store_path=None):
+    """
+    Remove a tweet table with its manifest and its id_str index before the raw files are loaded again
+    :param table_name: the name of the tweet table
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    """
+    tweet_store.remove_tweet_table(table_name, store_path)
+    for saved_path in [tweet_store.get_manifest_path(table_name, store_path),
+                       tweet_dedup.get_id_index_path(table_name, store_path)]:
+        if os.path.exists(saved_path):
+            os.remove(saved_path)
+
+
+def load_raw_tweets_to_store(*paths, table_name='tweet_combined', incremental=False, deduplicate=True,
+                             use_bloom_filter=False, workers=None, store_path=None):
+    """
+    Load the raw tweet csv files in parallel and write the filtered tweets straight to the tweet store.
+    The processed files, the id_str range of each file and the id_str watermark(the largest ingested id_str) are
+    recorded in the manifest of the tweet table, and the partitions receiving new tweets are marked dirty
+    :param paths: the paths which save the raw tweet csv files
+    :param table_name: the name of the tweet table in the tweet store
+    :param incremental: if True, skip the raw files which have been processed and only append the new tweets.
+    Hence adding a day of data only costs the time of the new tweets.
+    Otherwise, load all the raw files to an empty tweet table and rebuild the manifest
+    :param deduplicate: if True, drop the tweets whose id_str has been ingested(the raw files of different
+    collection runs overlap) based on the id_str index of the tweet table. Otherwise, the incremental ingestion
+    only appends the tweets whose id_str is larger than the watermark
+    :param use_bloom_filter: whether to use a Bloom filter in front of the id_str index
+    :param workers: the number of worker processes. If None, use the number of cores
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    :return: the number of tweets written to the tweet store
+    """
+    if incremental:
+        manifest = tweet_store.load_store_manifest(table_name, store_path)
+    else:
+        # Start from an empty tweet table. Otherwise the tweets of the previous runs are written twice
+        remove_ingested_table(table_name, store_path=store_path)
+        manifest = {'processed_files': {}, 'id_str_watermark': None, 'dirty_partitions': []}
+    processed_files = manifest['processed_files']
+    # The watermark of the previous runs. It is only moved forward after all the new files are written
+    watermark = manifest['id_str_watermark']
+    if deduplicate:
+        id_index = load_id_index_for_ingestion(manifest, table_name, store_path=store_path,
+                                               use_bloom_filter=use_bloom_filter)
+        # The index is saved at the end of the run. Before that, the saved index may miss the new ids
+        manifest['id_index_saved'] = False
+    file_paths = []
+    for file_path in list_raw_csv_files(*paths):
+        file_record = processed_files.get(file_path)
+        if file_record is not None and file_record['signature'] == get_file_signature(file_path):
+            continue
+        file_paths.append(file_path)
+    print('{} new raw files need to be processed'.format(len(file_paths)))
+
+    tweet_count = 0
+    duplicate_count = 0
+    new_watermark = watermark
+    for file_path, dataframe in iter_filtered_raw_csv_files(file_paths, workers=workers):
+        id_str_values = utils.parse_id_str(dataframe['id_str'])
+        file_record = {'signature': get_file_signature(file_path), 'tweet_count': 0, 'duplicate_count': 0,
+                       'min_id_str': None, 'max_id_str': None}
+        if id_str_values.notnull().any():
+            file_record['min_id_str'] = int(id_str_values.min())
+            file_record['max_id_str'] = int(id_str_values.max())
+            if new_watermark is None or file_record['max_id_str'] > new_watermark:
+                new_watermark = file_record['max_id_str']
+        filtered_tweet_number = dataframe.shape[0]
+        if deduplicate:
+            dataframe, file_record['duplicate_count'] = tweet_dedup.drop_duplicate_tweets(dataframe, id_index)
+        elif watermark is not None:
+            # The tweets without a valid id_str are dropped
+            dataframe = dataframe.loc[(id_str_values > watermark).fillna(False).to_numpy(dtype=bool)]
+        if dataframe.shape[0] > 0:
+            # The calendar features are computed once here and saved in the tweet store
+            dataframe_with_time = utils.add_calendar_features(utils.get_hk_time(dataframe.copy()))
+            tweet_store.write_tweet_store(dataframe_with_time, table_name=table_name, store_path=store_path)
+            tweet_store.mark_partitions_dirty(manifest, dataframe_with_time)
+        file_record['tweet_count'] = dataframe.shape[0]
+        processed_files[file_path] = file_record
+        # Save the manifest after each file, so an interrupted job could continue from the unprocessed files
+        tweet_store.save_store_manifest(manifest, table_name=table_name, store_path=store_path)
+        tweet_count += dataframe.shape[0]
+        duplicate_count += file_record['duplicate_count']
+        print('{}: {} tweets are written to the tweet store. Duplicate rate: {:.2%}'.format(
+            os.path.basename(file_path), dataframe.shape[0],
+            file_record['duplicate_count'] / filtered_tweet_number if filtered_tweet_number > 0 else 0))
+    manifest['id_str_watermark'] = new_watermark
+    if deduplicate:
+        tweet_dedup.save_id_index(id_index, table_name, store_path=store_path)
+        manifest['id_index_saved'] = True
+        print('{} duplicated tweets are dropped'.format(duplicate_count))
+    tweet_store.save_store_manifest(manifest, table_name=table_name, store_path=store_path)
+    return tweet_count
+
+
+if __name__ == '__main__':
+    # Only the new raw files and the tweets posted after the last run are added to the tweet store
+    tweet_number = load_raw_tweets_to_store(read_data.tweet_2016_raw, read_data.tweet_2017_raw,
+                                            read_data.tweet_2018_raw, table_name='tweet_combined',
+                                            incremental=True)
+    print('Number of new tweets written to the tweet store: {}'.format(tweet_number))
@@ -0,0 +1,330 @@
+import os
+import json
+import shutil
+import pandas as pd
+import numpy as np
+
+import read_data
+import utils
+
+# The tweet store saves each tweet table as a parquet dataset partitioned by year and month, e.g.
+# tweet_store_path/tweet_combined_sentiment_without_bots/year=2017/month=1/xxx.parquet
+# Compared with the csv files saved with quoting=csv.QUOTE_NONNUMERIC, the parquet files keep the real
+# dtype of each column and we could only load the columns we need
+partition_columns = ['year', 'month']
+
+# The fixed schema of the tweet store. Columns which are not listed here keep the dtype pandas gives them
+tweet_store_schema = {
+    'id_str': 'int64',
+    'user_id_str': 'int64',
+    'hk_time': 'datetime64[ns, Asia/Shanghai]',
+    'year': 'int16',
+    'month': 'int8',
+    'day': 'int8',
+    'hour': 'int8',
+    'month_name': 'category',
+    'month_plus_year': 'category',
+    'lat': 'float64',
+    'lon': 'float64',
+    'sentiment': 'int8',
+    'lang': 'category',
+    'verified': 'category',
+    'place_name': 'category',
+    'TPU_longitudinal': 'category',
+    'TPU_cross_sectional': 'category',
+}
+# The tweets read from the tweet store are sorted by these columns
+sort_columns = ['hk_time', 'id_str']
+# The 18-19 digit id columns, which are parsed with utils.parse_id_str rather than pd.to_numeric
+id_str_columns = ['id_str', 'user_id_str']
+
+# The compact in-memory dtype profile of a tweet dataframe. Compared with the tweet store schema, the coordinates
+# are saved as float32(about 1 meter precision for Hong Kong) and more low cardinality columns are categorical
+compact_tweet_schema = dict(tweet_store_schema)
+compact_tweet_schema.update({
+    'lat': 'float32',
+    'lon': 'float32',
+    'place_lat': 'float32',
+    'place_lon': 'float32',
+    'place_id': 'category',
+    'user_lang': 'category',
+    'time_zone': 'category',
+    'truncated': 'category',
+})
+# The other string columns are transformed to categorical columns if their ratio of unique values is below this
+category_unique_ratio = 0.1
+
+# The tweet tables saved as csv files in the tweet_combined_path which are moved to the tweet store
+tweet_tables = ['tweet_combined_sentiment_without_bots', 'tweets_with_chinese_vader',
+                'tweet_combined_cleaned_translated', 'tweet_combined_with_sentiment']
+
+
+def apply_tweet_store_schema(dataframe, schema=None):
+    """
+    Cast the columns of a tweet dataframe to the dtypes defined in the tweet_store_schema
+    :param dataframe: a tweet dataframe, for instance, one loaded by utils.read_local_csv_file
+    :param schema: the dict which maps the column names to the dtypes. If None, use the tweet_store_schema
+    :return: a copy of the dataframe in which each column of the schema has the proper dtype
+    """
+    if schema is None:
+        schema = tweet_store_schema
+    dataframe_copy = dataframe.copy()
+    for column_name, dtype in schema.items():
+        if column_name not in dataframe_copy.columns:
+            continue
+        if column_name == 'hk_time':
+            # the hk_time strings look like 2017-01-01 00:00:00+08:00
+            utils.normalize_hk_time(dataframe_copy)
+            dataframe_copy['hk_time'] = dataframe_copy['hk_time'].dt.tz_convert(utils.time_zone_hk)
+        elif column_name == 'month_name':
+            dataframe_copy['month_name'] = pd.Categorical(dataframe_copy['month_name'], categories=utils.month_names,
+                                                          ordered=True)
+        elif column_name == 'month_plus_year':
+            # Keep the time order of the month_plus_year categories
+            if not isinstance(dataframe_copy['month_plus_year'].dtype, pd.CategoricalDtype):
+                dataframe_copy['month_plus_year'] = utils.build_month_plus_year(
+                    dataframe_copy['year'], dataframe_copy['month'])
+        elif dtype == 'category':
+            dataframe_copy[column_name] = dataframe_copy[column_name].astype('category')
+        elif column_name in id_str_columns:
+            # Parse the ids exactly. The missing ids are kept with the nullable Int64 dtype
+            id_str_values = utils.parse_id_str(dataframe_copy[column_name])
+            dataframe_copy[column_name] = id_str_values if id_str_values.isnull().any() else \
+                id_str_values.astype(dtype)
+        else:
+            # The year, month and sentiment columns are saved as strings like '2017.0' in the csv files
+            numeric_values = pd.to_numeric(dataframe_copy[column_name], errors='coerce')
+            if dtype.startswith('int') and numeric_values.isnull().any():
+                # Keep the missing values(for instance, tweets without a sentiment label) with the nullable
+                # integer dtype, e.g. Int8
+                dataframe_copy[column_name] = numeric_values.astype(dtype.capitalize())
+            else:
+                dataframe_copy[column_name] = numeric_values.astype(dtype)
+    return dataframe_copy
+
+
+def get_memory_usage(dataframe):
+    # The memory usage of each column in MB, including the python string objects
+    return dataframe.memory_usage(deep=True, index=False) / 1024 ** 2
+
+
+def compact_tweet_dataframe(dataframe, show_report=True):
+    """
+    Convert a tweet dataframe(for instance, one loaded with dtype='str') to the compact_tweet_schema and report
+    the memory usage before and after the conversion
+    :param dataframe: a tweet dataframe
+    :param show_report: whether to print the memory usage of each column before and after the conversion
+    :return: the compact tweet dataframe
+    """
+    compact_dataframe = apply_tweet_store_schema(dataframe, schema=compact_tweet_schema)
+    for column_name in compact_dataframe.columns:
+        if column_name in compact_tweet_schema:
+            continue
+        column = compact_dataframe[column_name]
+        if (pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column)) and \
+                not isinstance(column.dtype, pd.CategoricalDtype) and \
+                column.nunique() < category_unique_ratio * max(column.shape[0], 1):
+            compact_dataframe[column_name] = column.astype('category')
+    if show_report:
+        memory_before, memory_after = get_memory_usage(dataframe), get_memory_usage(compact_dataframe)
+        memory_report = pd.DataFrame({'dtype_before': dataframe.dtypes, 'dtype_after': compact_dataframe.dtypes,
+                                      'memory_before_MB': memory_before, 'memory_after_MB': memory_after})
+        print(memory_report.round(3))
+        print('Memory usage: {:.2f} MB -> {:.2f} MB'.format(memory_before.sum(), memory_after.sum()))
+    return compact_dataframe
+
+
+def get_store_path(table_name, store_path=None):
+    if store_path is None:
+        store_path = read_data.tweet_store_path
+    return os.path.join(store_path, table_name)
+
+
+def remove_tweet_table(table_name, store_path=None):
+    # Remove the parquet dataset of a tweet table, if any
+    table_path = get_store_path(table_name, store_path)
+    if os.path.isdir(table_path):
+        shutil.rmtree(table_path)
+
+
+def write_tweet_store(dataframe, table_name, store_path=None, overwrite=False):
+    """
+    Save a tweet dataframe to the tweet store, partitioned by year and month
+    :param dataframe: the tweet dataframe. It should contain the year and month columns
+    :param table_name: the name of the saved tweet table, e.g. tweet_combined_sentiment_without_bots
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    :param overwrite: if True, the saved tweet table is removed first. Otherwise the new parquet files are added
+    to the partitions and the saved tweets are kept
+    """
+    for column_name in partition_columns:
+        assert column_name in dataframe.columns, 'The {} column is needed to partition the tweets'.format(
+            column_name)
+    dataframe_with_schema = apply_tweet_store_schema(dataframe)
+    if overwrite:
+        remove_tweet_table(table_name, store_path)
+    dataframe_with_schema.to_parquet(get_store_path(table_name, store_path), engine='pyarrow',
+                                     partition_cols=partition_columns, index=False)
+
+
+def get_table_columns(table_name, store_path=None):
+    # The names of the columns saved in a tweet table, including the partition columns
+    import pyarrow.dataset
+    return pyarrow.dataset.dataset(get_store_path(table_name, store_path), format='parquet',
+                                   partitioning='hive').schema.names
+
+
+def read_tweet_store(table_name, columns=None, years=None, months=None, partitions=None, store_path=None,
+                     sort=True):
+    """
+    Load a tweet table from the tweet store
+    :param table_name: the name of the saved tweet table
+    :param columns: the columns we want to load. If None, load all the columns
+    :param years: only load the partitions of these years, e.g. [2017, 2018]
+    :param months: only load the partitions of these months, e.g. [10, 11, 12]
+    :param partitions: only load these (year, month) partitions, e.g. the dirty partitions [(2018, 12)]
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    :param sort: if True, sort the tweets by hk_time and id_str, as in the time sorted csv files. Otherwise the rows
+    follow the order of the partition directories, e.g. 2017_1, 2017_10, 2017_11, 2017_2
+    :return: a tweet dataframe with the dtypes defined in tweet_store_schema
+    """
+    filters = []
+    if years is not None:
+        filters.append(('year', 'in', [int(year) for year in years]))
+    if months is not None:
+        filters.append(('month', 'in', [int(month) for month in months]))
+    if partitions is not None:
+        # A list of conjunctions: load the rows which match any of the (year, month) pairs
+        filters = [filters + [('year', '=', int(year)), ('month', '=', int(month))] for year, month in partitions]
+    load_columns = columns
+    if columns is not None:
+        extra_columns = []
+        if 'month_plus_year' in columns:
+            # The month_plus_year column is rebuilt from the year and month columns below
+            extra_columns += partition_columns
+        if sort:
+            extra_columns += [column_name for column_name in sort_columns
+                              if column_name in get_table_columns(table_name, store_path)]
+        extra_columns = [column_name for column_name in dict.fromkeys(extra_columns) if column_name not in columns]
+        if extra_columns:
+            load_columns = list(columns) + extra_columns
+    dataframe = pd.read_parquet(get_store_path(table_name, store_path), engine='pyarrow', columns=load_columns,
+                                filters=filters if filters else None)
+    # The partition columns are loaded as categorical columns. Transform them back to integers
+    for column_name in partition_columns:
+        if column_name in dataframe.columns:
+            dataframe[column_name] = dataframe[column_name].astype(np.int64).astype(
+                tweet_store_schema[column_name])
+    if 'month_plus_year' in dataframe.columns:
+        # Each parquet file saves its own categories. After the tweets are appended, the combined categories are
+        # sorted alphabetically, e.g. 2017_10 before 2017_2. Rebuild the time ordered categories
+        dataframe['month_plus_year'] = utils.build_month_plus_year(dataframe['year'], dataframe['month'])
+    if sort:
+        by_columns = [column_name for column_name in sort_columns if column_name in dataframe.columns]
+        if by_columns:
+            dataframe = dataframe.sort_values(by=by_columns, kind='mergesort').reset_index(drop=True)
+    if load_columns is not columns:
+        dataframe = dataframe[list(columns)]
+    return dataframe
+
+
+# The manifest of a tweet table records the ingested raw files, the id_str watermark and the dirty partitions.
+# It is saved next to the parquet dataset, e.g. tweet_store_path/tweet_combined_manifest.json
+def get_manifest_path(table_name, store_path=None):
+    return get_store_path(table_name, store_path) + '_manifest.json'
+
+
+def load_store_manifest(table_name, store_path=None):
+    """
+    Load the manifest of a tweet table
+    :param table_name: the name of the tweet table
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    :return: a dict with the processed_files, id_str_watermark and dirty_partitions keys
+    """
+    manifest_path = get_manifest_path(table_name, store_path)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    else:
+        manifest = {}
+    manifest.setdefault('processed_files', {})
+    manifest.setdefault('id_str_watermark', None)
+    manifest.setdefault('dirty_partitions', [])
+    return manifest
+
+
+def save_store_manifest(manifest, table_name, store_path=None):
+    """
+    Save the manifest of a tweet table. The manifest is written to a temporary file first and then renamed,
+    so an interrupted job never leaves a broken manifest
+    :param manifest: the manifest dict
+    :param table_name: the name of the tweet table
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    """
+    manifest_path = get_manifest_path(table_name, store_path)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def mark_partitions_dirty(manifest, dataframe):
+    """
+    Mark the (year, month) partitions touched by the newly written tweets as dirty, so the downstream tables
+    only need to be rebuilt for these partitions
+    :param manifest: the manifest dict of the tweet table
+    :param dataframe: the newly written tweet dataframe, which contains the year and month columns
+    :return: the manifest dict
+    """
+    dirty_partitions = set(tuple(partition) for partition in manifest['dirty_partitions'])
+    touched_partitions = dataframe[partition_columns].drop_duplicates()
+    dirty_partitions.update(zip(touched_partitions['year'].astype(int), touched_partitions['month'].astype(int)))
+    manifest['dirty_partitions'] = [list(partition) for partition in sorted(dirty_partitions)]
+    return manifest
+
+
+def get_dirty_partitions(table_name, store_path=None):
+    """
+    Get the partitions of a tweet table which received new tweets since the downstream tables were last built
+    :param table_name: the name of the tweet table
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    :return: a list of (year, month) tuples, which could be passed to read_tweet_store(partitions=...)
+    """
+    return [tuple(partition) for partition in load_store_manifest(table_name, store_path)['dirty_partitions']]
+
+
+def clear_dirty_partitions(table_name, partitions=None, store_path=None):
+    """
+    Clear the dirty flags after the downstream tables have been rebuilt for the dirty partitions
+    :param table_name: the name of the tweet table
+    :param partitions: the (year, month) partitions to clear. If None, clear all the dirty partitions
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    """
+    manifest = load_store_manifest(table_name, store_path)
+    if partitions is None:
+        manifest['dirty_partitions'] = []
+    else:
+        cleared_partitions = set((int(year), int(month)) for year, month in partitions)
+        manifest['dirty_partitions'] = [partition for partition in manifest['dirty_partitions']
+                                        if tuple(partition) not in cleared_partitions]
+    save_store_manifest(manifest, table_name, store_path)
+
+
+def convert_csv_to_tweet_store(path, filename, store_path=None):
+    """
+    Move one tweet table saved as a csv file to the tweet store
+    :param path: the path which saves the csv file
+    :param filename: the name of the csv file, e.g. tweet_combined_sentiment_without_bots.csv
+    :param store_path: the path of the tweet store. If None, use read_data.tweet_store_path
+    """
+    dataframe = utils.read_local_csv_file(path=path, filename=filename, dtype_str=True)
+    # Converting a csv file again replaces the tweet table rather than adding the tweets twice
+    write_tweet_store(dataframe, table_name=filename[:-4], store_path=store_path, overwrite=True)
+    print('{} has been moved to the tweet store. Number of tweets: {}'.format(filename, dataframe.shape[0]))
+
+
+if __name__ == '__main__':
+    for table in tweet_tables:
+        if os.path.exists(os.path.join(read_data.tweet_combined_path, table + '.csv')):
+            convert_csv_to_tweet_store(path=read_data.tweet_combined_path, filename=table + '.csv')
+        else:
+            print('{}.csv is not found in {}'.format(table, read_data.tweet_combined_path))
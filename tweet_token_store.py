@@ -0,0 +1,276 @@
+import os
+import csv
+import json
+
+import numpy as np
+import pandas as pd
+
+import read_data
+import utils
+
+# nltk is imported in get_tokenizer. The token lists are usually read from a saved token store instead
+
+# The files of a token store. The tokens of all the tweets are saved as one flat array of vocabulary ids, and the
+# tokens of the i-th tweet are token_ids[offsets[i]:offsets[i + 1]]
+vocabulary_filename = 'vocabulary.json'
+token_ids_filename = 'token_ids.npy'
+offsets_filename = 'offsets.npy'
+id_str_filename = 'id_str.npy'
+# The hash of the text each tweet was tokenized from. A tweet whose text changed, e.g. after a re-clean, is
+# tokenized again rather than reusing the stale tokens
+text_hash_filename = 'text_hash.npy'
+
+
+def get_tokenizer(tokenizer_name):
+    """
+    Get the tokenizer used to build a token store
+    :param tokenizer_name: 'word' for the nltk word_tokenize used by the wordcloud and topic modelling code,
+    'tweet' for the nltk TweetTokenizer used to compute the tweet representations, or 'whitespace' for str.split
+    used by the English word filter of the cleaning notebook
+    :return: a function which maps a string to a list of tokens
+    """
+    if tokenizer_name == 'whitespace':
+        return str.split
+    elif tokenizer_name == 'word':
+        from nltk.tokenize import word_tokenize
+        return word_tokenize
+    elif tokenizer_name == 'tweet':
+        from nltk.tokenize import TweetTokenizer
+        return TweetTokenizer(preserve_case=False, reduce_len=True, strip_handles=True).tokenize
+    else:
+        raise ValueError('The tokenizer name should be word, tweet or whitespace, got {}'.format(tokenizer_name))
+
+
+def get_id_str_array(id_strs):
+    # The id_str saved as int64. The missing or broken ones get -1
+    return utils.parse_id_str(id_strs).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def get_text_hashes(texts):
+    # The uint64 hash of each text. The texts are hashed as strings, in the same way as they are tokenized
+    return pd.util.hash_pandas_object(pd.Series([str(text) for text in texts], dtype=object),
+                                      index=False).to_numpy(dtype=np.uint64)
+
+
+def get_token_store_path(tokenizer_name, store_path=None):
+    # Each tokenizer has its own token store, e.g. token_store_path/word
+    if store_path is None:
+        store_path = read_data.token_store_path
+    return os.path.join(store_path, tokenizer_name)
+
+
+class TokenStore(object):
+
+    def __init__(self, vocabulary, token_ids, offsets, id_strs, text_hashes=None):
+        """
+        The tokens of a tweet table saved as integer ids against a shared vocabulary in a ragged array
+        :param vocabulary: a list of the distinct tokens. The id of a token is its position in the list
+        :param token_ids: a numpy int32 array of the token ids of all the tweets
+        :param offsets: a numpy int64 array. The token ids of the i-th tweet are token_ids[offsets[i]:offsets[i + 1]]
+        :param id_strs: a numpy int64 array of the id_str of the tweets
+        :param text_hashes: a numpy uint64 array of the hashes of the tokenized texts. See get_text_hashes
+        """
+        self.vocabulary = vocabulary
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.id_strs = id_strs
+        self.text_hashes = text_hashes
+        # The lookup from the id_str to the position of the tweet. It is built when it is first needed
+        self.id_str_index = None
+        self.id_str_positions = None
+        # The last token store without some terms, e.g. the stopwords, and these terms. See drop_terms
+        self.filtered_terms = None
+        self.filtered_store = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get_token_ids(self, position):
+        return self.token_ids[self.offsets[position]:self.offsets[position + 1]]
+
+    def get_tokens(self, position):
+        return [self.vocabulary[token_id] for token_id in self.get_token_ids(position)]
+
+    def get_lengths(self):
+        return np.diff(self.offsets)
+
+    def build_id_str_index(self):
+        # Index the first occurrence of each valid id_str. The missing ids(-1) are never used as keys
+        valid_positions = np.flatnonzero(np.asarray(self.id_strs) >= 0)
+        valid_ids = np.asarray(self.id_strs)[valid_positions]
+        first_occurrence_mask = ~pd.Series(valid_ids).duplicated().to_numpy()
+        self.id_str_index = pd.Index(valid_ids[first_occurrence_mask])
+        self.id_str_positions = valid_positions[first_occurrence_mask]
+
+    def get_positions(self, id_strs, texts=None):
+        """
+        Get the positions of the tweets in the token store
+        :param id_strs: the id_str of the tweets, e.g. the id_str column of a tweet dataframe
+        :param texts: the current texts of the tweets. If given, the tweets whose text differs from the text the
+        store was built from get -1, so their stale tokens are not used
+        :return: a numpy int64 array. The tweets which are not in the store or have no valid id_str get -1
+        """
+        if self.id_str_index is None:
+            self.build_id_str_index()
+        id_str_values = utils.parse_id_str(id_strs)
+        valid_mask = id_str_values.notnull().to_numpy()
+        positions = np.full(len(id_str_values), -1, dtype=np.int64)
+        index_positions = self.id_str_index.get_indexer(id_str_values[valid_mask].to_numpy(dtype=np.int64))
+        positions[valid_mask] = np.where(index_positions >= 0, self.id_str_positions[index_positions], -1)
+        if texts is not None:
+            if self.text_hashes is None:
+                # The store was saved without the text hashes. Its tokens could not be checked
+                print('The token store has no text hashes. All the tweets are tokenized again')
+                return np.full(len(positions), -1, dtype=np.int64)
+            found = positions >= 0
+            text_hashes = get_text_hashes(texts)
+            changed = text_hashes[found] != self.text_hashes[positions[found]]
+            positions[np.flatnonzero(found)[changed]] = -1
+        return positions
+
+    def get_texts(self, empty_texts=None):
+        """
+        Join the tokens of each tweet with whitespace
+        :param empty_texts: a list of texts used for the tweets without any token. If None, use ''
+        :return: a list of strings in the order of the token store
+        """
+        vocabulary_array = np.array(self.vocabulary, dtype=object)
+        texts = []
+        for position in range(len(self)):
+            token_ids = self.get_token_ids(position)
+            if len(token_ids) == 0 and empty_texts is not None:
+                texts.append(empty_texts[position])
+            else:
+                texts.append(' '.join(vocabulary_array[token_ids]))
+        return texts
+
+    def get_vocabulary_mask(self, terms):
+        # A boolean array which is True for the vocabulary entries in terms
+        return np.fromiter((token in terms for token in self.vocabulary), dtype=bool, count=len(self.vocabulary))
+
+    def filter_tokens(self, keep_mask):
+        """
+        Filter the tokens of all the tweets at once. The tokenization is not run again
+        :param keep_mask: a boolean array over the vocabulary ids. The tokens whose entry is False are removed
+        :return: a TokenStore object with the same vocabulary and tweets
+        """
+        kept = keep_mask[self.token_ids]
+        kept_counts = np.zeros(len(kept) + 1, dtype=np.int64)
+        np.cumsum(kept, out=kept_counts[1:])
+        filtered_store = TokenStore(self.vocabulary, self.token_ids[kept], kept_counts[self.offsets], self.id_strs,
+                                    self.text_hashes)
+        # The tweets are the same, so the id_str lookup is shared
+        filtered_store.id_str_index, filtered_store.id_str_positions = self.id_str_index, self.id_str_positions
+        return filtered_store
+
+    def drop_terms(self, terms):
+        """
+        Remove the given terms, e.g. the stopwords, from all the tweets. Only the result of the last set of terms
+        is kept, so calling it again with the same stopwords does not filter the token array again
+        :param terms: a set of terms
+        :return: a TokenStore object without the terms
+        """
+        terms = frozenset(terms)
+        if terms != self.filtered_terms:
+            self.filtered_store = self.filter_tokens(~self.get_vocabulary_mask(terms))
+            self.filtered_terms = terms
+        return self.filtered_store
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, vocabulary_filename), 'w', encoding='utf-8') as vocabulary_file:
+            json.dump(self.vocabulary, vocabulary_file, ensure_ascii=False)
+        np.save(os.path.join(path, token_ids_filename), self.token_ids)
+        np.save(os.path.join(path, offsets_filename), self.offsets)
+        np.save(os.path.join(path, id_str_filename), self.id_strs)
+        if self.text_hashes is not None:
+            np.save(os.path.join(path, text_hash_filename), self.text_hashes)
+
+    @staticmethod
+    def load(path, mmap_mode='r'):
+        """
+        Load a saved token store
+        :param path: the path of the token store
+        :param mmap_mode: the mmap mode of the token id array. Hence only the touched tweets are read from the disk
+        :return: a TokenStore object
+        """
+        with open(os.path.join(path, vocabulary_filename), 'r', encoding='utf-8') as vocabulary_file:
+            vocabulary = json.load(vocabulary_file)
+        text_hash_path = os.path.join(path, text_hash_filename)
+        text_hashes = np.load(text_hash_path) if os.path.exists(text_hash_path) else None
+        return TokenStore(vocabulary, np.load(os.path.join(path, token_ids_filename), mmap_mode=mmap_mode),
+                          np.load(os.path.join(path, offsets_filename)), np.load(os.path.join(path, id_str_filename)),
+                          text_hashes)
+
+
+def build_token_store(texts, id_strs, tokenizer_name='word'):
+    """
+    Tokenize each tweet once and build the token store
+    :param texts: a list of cleaned tweet texts
+    :param id_strs: the id_str of the tweets
+    :param tokenizer_name: 'word' or 'tweet'. See get_tokenizer
+    :return: a TokenStore object
+    """
+    tokenize = get_tokenizer(tokenizer_name)
+    vocabulary_dict = {}
+    token_ids = []
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    for position, text in enumerate(texts):
+        tokens = tokenize(str(text))
+        token_ids.extend(vocabulary_dict.setdefault(token, len(vocabulary_dict)) for token in tokens)
+        offsets[position + 1] = offsets[position] + len(tokens)
+        if (position + 1) % 100000 == 0:
+            print('The first {} tweets have been tokenized'.format(position + 1))
+    return TokenStore(list(vocabulary_dict), np.array(token_ids, dtype=np.int32), offsets, get_id_str_array(id_strs),
+                      get_text_hashes(texts))
+
+
+def load_token_store(tokenizer_name='word', store_path=None):
+    return TokenStore.load(get_token_store_path(tokenizer_name, store_path))
+
+
+def get_token_lists(dataframe, token_store=None, tokenizer_name='word', text_column='cleaned_text',
+                    stop_words=None):
+    """
+    Get the token lists of the tweets in a dataframe. The tweets found in the token store with an
+    unchanged text are not tokenized again
+    :param dataframe: a tweet dataframe with the id_str and the text column
+    :param token_store: a TokenStore object built with the same tokenizer. If None, tokenize all the tweets
+    :param tokenizer_name: the tokenizer used for the tweets which are not in the token store
+    :param text_column: the column of the cleaned text
+    :param stop_words: a set of terms removed from the token lists. If None, keep all the tokens
+    :return: a list of token lists in the row order of the dataframe
+    """
+    texts = list(dataframe[text_column])
+    if token_store is None:
+        positions = np.full(len(texts), -1)
+    else:
+        positions = token_store.get_positions(dataframe['id_str'], texts=texts)
+        if stop_words is not None:
+            token_store = token_store.drop_terms(stop_words)
+    tokenize = None
+    token_lists = []
+    for position, text in zip(positions, texts):
+        if position >= 0:
+            token_lists.append(token_store.get_tokens(position))
+        else:
+            if tokenize is None:
+                tokenize = get_tokenizer(tokenizer_name)
+            tokens = tokenize(str(text))
+            if stop_words is not None:
+                tokens = [token for token in tokens if token not in stop_words]
+            token_lists.append(tokens)
+    return token_lists
+
+
+if __name__ == '__main__':
+    # Tokenize the cleaned tweets once with each tokenizer and save the token stores
+    tweet_dataframe = pd.read_csv(os.path.join(read_data.tweet_combined_path, 'tweet_combined_cleaned_translated.csv'),
+                                  encoding='utf-8', quoting=csv.QUOTE_NONNUMERIC, dtype='str',
+                                  usecols=['id_str', 'cleaned_text'])
+    for name in ['word', 'tweet']:
+        token_store = build_token_store(list(tweet_dataframe['cleaned_text'].fillna('')), tweet_dataframe['id_str'],
+                                        tokenizer_name=name)
+        token_store.save(get_token_store_path(name))
+        print('The {} token store has {} tweets, {} tokens and {} distinct tokens'.format(
+            name, len(token_store), len(token_store.token_ids), len(token_store.vocabulary)))
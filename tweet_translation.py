@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import read_data
+
+# The default path of the memo which saves the translation of each token
+default_memo_filename = 'token_translation_memo.json'
+
+
+class DictionaryBackend(object):
+
+    def __init__(self, dictionary):
+        """
+        A local translation backend which looks up the tokens in a dict. It could be used offline and in tests
+        :param dictionary: a dict which maps the tokens to their translations. Other tokens are kept
+        """
+        self.dictionary = dictionary
+
+    def translate_batch(self, tokens):
+        return [self.dictionary.get(token, token) for token in tokens]
+
+
+class GoogleTranslateBackend(object):
+
+    def __init__(self, client=None, target_language='en'):
+        """
+        A translation backend based on the Google Cloud Translation API. A batch of tokens costs one language
+        detection request and at most one translation request
+        :param client: a google.cloud.translate Client. If None, create one with the credential saved in the
+        GOOGLE_APPLICATION_CREDENTIALS environment variable
+        :param target_language: the target language
+        """
+        if client is None:
+            from google.cloud import translate
+            client = translate.Client()
+        self.client = client
+        self.target_language = target_language
+
+    def translate_batch(self, tokens):
+        translations = list(tokens)
+        detections = self.client.detect_language(list(tokens))
+        # Only the tokens which are not in the target language are translated
+        positions = [position for position, detection in enumerate(detections)
+                     if detection['language'][:2] != self.target_language]
+        if positions:
+            results = self.client.translate([tokens[position] for position in positions],
+                                            target_language=self.target_language)
+            for position, result in zip(positions, results):
+                translations[position] = result['translatedText']
+        return translations
+
+
+class RateLimiter(object):
+
+    def __init__(self, requests_per_second):
+        # The limiter should be created in the running event loop
+        self.interval = 1.0 / requests_per_second
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = asyncio.get_event_loop().time()
+            if self.next_time > now:
+                await asyncio.sleep(self.next_time - now)
+            self.next_time = max(now, self.next_time) + self.interval
+
+
+def split_text_for_translation(text):
+    """
+    Split a cleaned Chinese tweet into the tokens sent to the translation backend
+    :param text: the cleaned Chinese tweet
+    :return: a list of tokens
+    """
+    # remove hashtag and @
+    result1 = text.replace('#', '').replace('@', '')
+    result2 = result1.lower().replace('<u+', '\\u').replace('>', '')
+    result3 = re.sub('<([a-z0-9]{2})*', '', result2)
+    return result3.split()
+
+
+def get_memo_path(memo_path=None):
+    if memo_path is None:
+        memo_path = os.path.join(read_data.tweet_combined_path, default_memo_filename)
+    return memo_path
+
+
+def load_translation_memo(memo_path=None):
+    memo_path = get_memo_path(memo_path)
+    if os.path.exists(memo_path):
+        with open(memo_path, 'r', encoding='utf-8') as memo_file:
+            return json.load(memo_file)
+    return {}
+
+
+def save_translation_memo(memo, memo_path=None):
+    # Write to a temporary file first, so an interrupted job never leaves a broken memo
+    memo_path = get_memo_path(memo_path)
+    os.makedirs(os.path.dirname(os.path.abspath(memo_path)), exist_ok=True)
+    with open(memo_path + '.tmp', 'w', encoding='utf-8') as memo_file:
+        json.dump(memo, memo_file, ensure_ascii=False)
+    os.replace(memo_path + '.tmp', memo_path)
+
+
+async def translate_batches_async(batches, backend, max_concurrency, requests_per_second):
+    """
+    Send the batches of tokens to the backend with at most max_concurrency requests in flight and at most
+    requests_per_second requests started per second
+    :param batches: a list of token lists
+    :param backend: an object with a translate_batch method, e.g. GoogleTranslateBackend or DictionaryBackend
+    :param max_concurrency: the maximum number of batches being translated at the same time
+    :param requests_per_second: the maximum number of batches sent per second
+    :return: a list of the translated token lists. The batches which fail are None
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    rate_limiter = RateLimiter(requests_per_second)
+    loop = asyncio.get_event_loop()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        async def translate_one_batch(batch):
+            async with semaphore:
+                await rate_limiter.wait()
+                try:
+                    return await loop.run_in_executor(executor, backend.translate_batch, batch)
+                except Exception as error:
+                    print('Failed to translate a batch of {} tokens: {}'.format(len(batch), error))
+                    return None
+
+        return await asyncio.gather(*(translate_one_batch(batch) for batch in batches))
+
+
+def run_coroutine(coroutine):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # In a jupyter notebook the event loop is already running. Hence the coroutine runs in another thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def translate_tokens(tokens, backend, memo, batch_size=100, max_concurrency=4, requests_per_second=5.0):
+    """
+    Translate the tokens which are not in the memo and add their translations to the memo
+    :param tokens: an iterable of tokens. Each distinct token is translated once
+    :param backend: an object with a translate_batch method
+    :param memo: a dict which maps the tokens to their translations
+    :param batch_size: the number of tokens in one request
+    :param max_concurrency: the maximum number of requests in flight
+    :param requests_per_second: the maximum number of requests sent per second
+    :return: the number of newly translated tokens
+    """
+    new_tokens = sorted(set(tokens).difference(memo))
+    batches = [new_tokens[start:start + batch_size] for start in range(0, len(new_tokens), batch_size)]
+    results = run_coroutine(translate_batches_async(batches, backend, max_concurrency, requests_per_second))
+    translated_number = 0
+    for batch, translations in zip(batches, results):
+        # The tokens of the failed batches are not saved in the memo and are tried again in the next run
+        if translations is not None:
+            memo.update(zip(batch, translations))
+            translated_number += len(batch)
+    return translated_number
+
+
+def translate_tweets(texts, backend, memo_path=None, batch_size=100, max_concurrency=4, requests_per_second=5.0):
+    """
+    Translate the cleaned Chinese tweets token by token. The tokens are deduplicated across the corpus, sent in
+    batches and saved in a persistent memo, so a token is only translated once over all the runs
+    :param texts: a list of cleaned Chinese tweets
+    :param backend: an object with a translate_batch method, e.g. GoogleTranslateBackend or DictionaryBackend
+    :param memo_path: the path of the json memo. If None, use the token_translation_memo.json in
+    read_data.tweet_combined_path
+    :param batch_size: the number of tokens in one request
+    :param max_concurrency: the maximum number of requests in flight
+    :param requests_per_second: the maximum number of requests sent per second
+    :return: a list of the translated tweets
+    """
+    tokenized_texts = [split_text_for_translation(text) for text in texts]
+    memo = load_translation_memo(memo_path)
+    translated_number = translate_tokens((token for tokens in tokenized_texts for token in tokens), backend, memo,
+                                         batch_size=batch_size, max_concurrency=max_concurrency,
+                                         requests_per_second=requests_per_second)
+    save_translation_memo(memo, memo_path)
+    print('{} new tokens are translated. The memo has {} tokens'.format(translated_number, len(memo)))
+    # The tokens which could not be translated are kept
+    return [' '.join(memo.get(token, token) for token in tokens) for tokens in tokenized_texts]
@@ -1,15 +1,14 @@
 import re
 import os
 import pandas as pd
+import numpy as np
 import csv
 import pytz
 from datetime import datetime
 from collections import Counter
-from geopy.distance import vincenty
 
-# For plots
-from matplotlib import pyplot as plt
-import seaborn as sns
+# geopy and the plotting packages(matplotlib, seaborn) are imported inside the functions which need them.
+# Hence importing utils in the worker processes and the batch jobs is cheap
 
 import read_data
 
@@ -18,12 +17,12 @@ time_zone_hk = pytz.timezone('Asia/Shanghai')
 # For instance, if we want to compare the sentiment and activity level before and after the
 # openning date of the Whampoa MTR railway station in Hong Kong, since the station is opened on 23 Oct 2016,
 # we could specify the openning date using datatime package and output before and after dataframes
-october_23_start = datetime(2016, 10, 23, 0, 0, 0, tzinfo=time_zone_hk)
-october_23_end = datetime(2016, 10, 23, 23, 59, 59, tzinfo=time_zone_hk)
-december_28_start = datetime(2016, 12, 28, 0, 0, 0, tzinfo=time_zone_hk)
-december_28_end = datetime(2016, 12, 28, 23, 59, 59, tzinfo=time_zone_hk)
-start_date = datetime(2016, 5, 7, 0, 0, 0, tzinfo=time_zone_hk)
-end_date = datetime(2017, 12, 31,  23, 59, 59, tzinfo=time_zone_hk)
+october_23_start = time_zone_hk.localize(datetime(2016, 10, 23, 0, 0, 0))
+october_23_end = time_zone_hk.localize(datetime(2016, 10, 23, 23, 59, 59))
+december_28_start = time_zone_hk.localize(datetime(2016, 12, 28, 0, 0, 0))
+december_28_end = time_zone_hk.localize(datetime(2016, 12, 28, 23, 59, 59))
+start_date = time_zone_hk.localize(datetime(2016, 5, 7, 0, 0, 0))
+end_date = time_zone_hk.localize(datetime(2017, 12, 31, 23, 59, 59))
 
 # The replacement patterns used in cleaning the raw text data
 replacement_patterns = [
@@ -44,17 +43,62 @@ replacement_patterns = [
 ]
 
 
+# After the character filter(the second replacement pattern) the words are separated by blanks, and none of
+# the other replacement patterns could match a blank. Hence they could be applied word by word, and only to the
+# words which contain an apostrophe or a number followed by k
+fused_word_pattern = re.compile(r"(?<![^ ])[^ ]*?(?:'|\dk)[^ ]*")
+
+
 # A RegexpReplacer to clean some texts based on specified patterns
 class RegexpReplacer(object):
-    def __init__(self, patterns):
-        self.patterns = [(re.compile(regex), repl) for (regex, repl) in replacement_patterns]
-
-    def replace(self, text):
+    def __init__(self, patterns=None, max_cached_words=100000):
+        """
+        :param patterns: a list of (regex, replacement) pairs applied in order. If None, use replacement_patterns
+        :param max_cached_words: the maximum number of cleaned words cached by the fused replacement
+        """
+        if patterns is None:
+            patterns = replacement_patterns
+        self.patterns = [(re.compile(regex), repl) for (regex, repl) in patterns]
+        # The fused replacement gives the same output as the sequential one only for the default patterns
+        self.fused = list(patterns) == replacement_patterns
+        self.max_cached_words = max_cached_words
+        self.word_cache = {}
+
+    def replace_sequentially(self, text):
         s = text
         for (pattern, repl) in self.patterns:
-            s = re.sub(pattern=pattern, repl=repl, string=s)  # subn returns the times of replacement
+            s = pattern.sub(repl, s)  # subn returns the times of replacement
         return s
 
+    def replace_word(self, word):
+        # The words like don't and it's appear in many tweets. Hence the cleaned words are cached
+        cleaned_word = self.word_cache.get(word)
+        if cleaned_word is None:
+            cleaned_word = word
+            for pattern, repl in self.patterns[:1] + self.patterns[2:]:
+                cleaned_word = pattern.sub(repl, cleaned_word)
+            if len(self.word_cache) >= self.max_cached_words:
+                self.word_cache.clear()
+            self.word_cache[word] = cleaned_word
+        return cleaned_word
+
+    def replace(self, text):
+        """
+        Clean the text based on the patterns. For the default patterns, the character filter runs in one pass
+        and the other patterns are dispatched to the words which they could match in a second pass. The output
+        is the same as applying the patterns one by one
+        :param text: a string
+        :return: the cleaned string
+        """
+        if not self.fused:
+            return self.replace_sequentially(text)
+        # The won't pattern is moved after the character filter. It does not change the output since the
+        # characters in won't are all kept by the filter
+        s = self.patterns[1][0].sub(' ', text)
+        if "'" not in s and 'k' not in s:
+            return s
+        return fused_word_pattern.sub(lambda match: self.replace_word(match.group(0)), s)
+
 
 def read_local_csv_file(path, filename, dtype_str=True):
     if dtype_str:
@@ -66,16 +110,61 @@ def read_local_csv_file(path, filename, dtype_str=True):
     return dataframe
 
 
+# The largest id_str which fits in an int64 column
+max_id_str = np.iinfo(np.int64).max
+
+
+def parse_id_str(id_strs):
+    """
+    Parse the id_str values(tweet ids or user ids) to integers exactly. The 18-19 digit ids can't be represented
+    by float64, so the values never go through float(pd.to_numeric gives float64 as soon as one id is missing)
+    :param id_strs: a pandas series or a list of id_str values, e.g. strings loaded with dtype='str'
+    :return: a pandas series with the nullable Int64 dtype. Missing or malformed ids are saved as <NA>
+    """
+    id_str_series = id_strs if isinstance(id_strs, pd.Series) else pd.Series(list(id_strs), dtype=object)
+    if pd.api.types.is_integer_dtype(id_str_series.dtype):
+        return id_str_series.astype('Int64')
+    id_str_values = id_str_series.astype('string').str.strip()
+    valid_mask = id_str_values.str.fullmatch(r'\d{1,19}').fillna(False).to_numpy(dtype=bool)
+    # 19 digit strings may still exceed the int64 range. uint64 holds any 19 digit number
+    unsigned_values = np.zeros(id_str_values.shape[0], dtype=np.uint64)
+    unsigned_values[valid_mask] = id_str_values[valid_mask].to_numpy(dtype=object).astype(np.uint64)
+    valid_mask &= unsigned_values <= max_id_str
+    int_values = np.where(valid_mask, unsigned_values, 0).astype(np.int64)
+    return pd.Series(pd.arrays.IntegerArray(int_values, ~valid_mask), index=id_str_series.index,
+                     name=id_str_series.name)
+
+
+# The hk_time strings saved in the csv files look like: 2017-01-01 00:00:00+08:00
+hk_time_string_format = '%Y-%m-%d %H:%M:%S+08:00'
+
+
 def transform_string_time_to_datetime(string):
     """
     :param string: the string which records the time of the posted tweets(this string's timezone is HK time)
     :return: a datetime object which could get access to the year, month, day easily
     """
-    datetime_object = datetime.strptime(string, '%Y-%m-%d %H:%M:%S+08:00')
-    final_time_object = datetime_object.replace(tzinfo=time_zone_hk)
+    datetime_object = datetime.strptime(string, hk_time_string_format)
+    # Use localize rather than replace(tzinfo=...). Otherwise pytz gives the local mean time(+08:06)
+    final_time_object = time_zone_hk.localize(datetime_object)
     return final_time_object
 
 
+def normalize_hk_time(df):
+    """
+    Make sure that the hk_time column of a tweet dataframe is a datetime column. If the hk_time values are strings,
+    the whole column is parsed in one vectorized pass and saved back to the dataframe in place. Hence the following
+    analyses based on the same dataframe(for instance, the DiD analyses with different windows) never parse the
+    strings again
+    :param df: a tweet dataframe with the hk_time column
+    :return: the same dataframe, whose hk_time column is a tz-aware datetime column in Hong Kong time
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df['hk_time']):
+        # The strings all have the +08:00 utc offset. Some dataframes may mix strings and datetime objects
+        df['hk_time'] = pd.to_datetime(df['hk_time'], utc=True).dt.tz_convert(time_zone_hk)
+    return df
+
+
 def number_of_tweet_user(df):
     user_num = len(set(df['user_id_str']))
     tweet_num = df.shape[0]
@@ -94,30 +183,84 @@ def find_tweet(keywords, tweet):
     return result
 
 
+# The created_at strings of the tweets look like: Wed Oct 10 20:19:24 +0000 2018
+created_at_format = '%a %b %d %H:%M:%S %z %Y'
+
+
+def convert_created_at_to_hk_time(created_at):
+    """
+    Convert the created_at column of the tweets to the Hong Kong time in one vectorized pass
+    :param created_at: a pandas series which saves the created_at strings(UTC time)
+    :return: a tz-aware datetime64 pandas series in the Asia/Shanghai time zone
+    """
+    utc_time = pd.to_datetime(created_at, format=created_at_format, utc=True)
+    return utc_time.dt.tz_convert(time_zone_hk)
+
+
 # get the hk_time column based on the created_at column
 def get_hk_time(df):
-    changed_time_list = []
-    for _, row in df.iterrows():
-        time_to_change = datetime.strptime(row['created_at'], '%a %b %d %H:%M:%S %z %Y')
-        # get the hk time
-        changed_time = time_to_change.astimezone(time_zone_hk)
-        changed_time_list.append(changed_time)
-    df['hk_time'] = changed_time_list
+    df['hk_time'] = convert_created_at_to_hk_time(df['created_at'])
     return df
 
 
+# The abbreviated month names used in the month_name column
+month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def build_month_plus_year(years, months):
+    """
+    Build the month_plus_year values, e.g. 2017_1, from the year and month values in one vectorized pass
+    :param years: the year values, which could be integers or strings like '2017.0'
+    :param months: the month values, which could be integers or strings like '1.0'
+    :return: an ordered categorical whose categories are sorted by time rather than alphabetically
+    """
+    year_array = pd.to_numeric(pd.Series(years)).to_numpy().astype(np.int64)
+    month_array = pd.to_numeric(pd.Series(months)).to_numpy().astype(np.int64)
+    month_index_array = year_array * 12 + month_array - 1
+    unique_month_index, codes = np.unique(month_index_array, return_inverse=True)
+    categories = ['{}_{}'.format(month_index // 12, month_index % 12 + 1) for month_index in unique_month_index]
+    return pd.Categorical.from_codes(codes.reshape(-1), categories=categories, ordered=True)
+
+
+# get the month_plus_year column of a tweet dataframe. Reuse the saved column if the dataframe already has it
+def get_month_plus_year(df):
+    if 'month_plus_year' in df.columns:
+        return df['month_plus_year']
+    if 'year' in df.columns and 'month' in df.columns:
+        return pd.Series(build_month_plus_year(df['year'], df['month']), index=df.index)
+    else:
+        return pd.Series(build_month_plus_year(df['hk_time'].dt.year, df['hk_time'].dt.month), index=df.index)
+
+
 # get the year, month, day information of based on any tweet dataframe
 def get_year_month_day(df):
     df_copy = df.copy()
-    df_copy['year'] = df_copy.apply(lambda row: row['hk_time'].year, axis=1)
-    df_copy['month'] = df_copy.apply(lambda row: row['hk_time'].month, axis=1)
-    df_copy['day'] = df_copy.apply(lambda row: row['hk_time'].day, axis=1)
+    df_copy['year'] = df_copy['hk_time'].dt.year
+    df_copy['month'] = df_copy['hk_time'].dt.month
+    df_copy['day'] = df_copy['hk_time'].dt.day
+    return df_copy
+
+
+def add_calendar_features(df):
+    """
+    Add all the calendar features we use in the analyses in a single vectorized pass: year, month, month_name,
+    day, hour and month_plus_year. These features are computed once when the tweets are loaded and saved in the
+    tweet store so that the analyses don't need to compute them again
+    :param df: a tweet dataframe with the datetime hk_time column
+    :return: a copy of the dataframe with the calendar feature columns
+    """
+    df_copy = get_year_month_day(df)
+    df_copy['month_name'] = pd.Categorical.from_codes(df_copy['month'].to_numpy() - 1, categories=month_names,
+                                                      ordered=True)
+    df_copy['hour'] = df_copy['hk_time'].dt.hour
+    df_copy['month_plus_year'] = build_month_plus_year(df_copy['year'], df_copy['month'])
     return df_copy
 
 
 # Calculate the haversine distance between two points based on latitude and longitude
 # More about the haversine distance: https://en.wikipedia.org/wiki/Haversine_formula
 def distance_calc(row, station_lat, station_lon):
+    from geopy.distance import vincenty
     start = (row['lat'], row['lon'])
     stop = (station_lat, station_lon)
     return vincenty(start, stop).meters
@@ -169,6 +312,7 @@ def build_dataframe_for_urban_rate(source_dataframe):
 
 
 def build_line_graph_urban_rate(dataframe):
+    from matplotlib import pyplot as plt
     x = list(dataframe['Year'])
     y_china = list(dataframe['China'])
     y_us = list(dataframe['US'])
@@ -191,6 +335,7 @@ def build_line_graph_urban_rate(dataframe):
 
 
 def build_bar_plot_distribution_comparison(**key_list_dict):
+    from matplotlib import pyplot as plt
     name_list = list(key_list_dict.keys())
     if len(name_list) ==  1:
         value_list = key_list_dict[name_list[0]]
@@ -209,6 +354,8 @@ def build_bar_plot_distribution_comparison(**key_list_dict):
 
 
 def classifiers_performance_compare(filename):
+    from matplotlib import pyplot as plt
+    import seaborn as sns
     result_dataframe = pd.DataFrame(columns=['metrics', 'performance', 'Classifiers'])
 
     accuracy_list = [0.64, 0.70, 0.70, 0.67]
@@ -257,12 +404,7 @@ def general_info_of_tweet_dataset(df, study_area:str, show_result=True):
 
 
 def general_info_before_and_after_compare(df, oct_open:bool, study_area:str, show_result_or_not=True):
-    df_copy = df.copy()
-    if isinstance(list(df['hk_time'])[0], str):
-        df_copy['hk_time'] = df_copy.apply(
-                lambda row: transform_string_time_to_datetime(row['hk_time']), axis=1)
-    else:
-        pass
+    df_copy = normalize_hk_time(df).copy()
     df_copy_sorted = df_copy.sort_values(by='hk_time')
     if oct_open:
         before_time_mask = (df_copy_sorted['hk_time'] < october_23_start)